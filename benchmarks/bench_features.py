@@ -0,0 +1,76 @@
+"""Benchmark of rolling-form feature building over a synthetic season, against the previous per-window loop in
+models.correlation_test.
+
+Run from the repository root with `python -m benchmarks.bench_features`
+"""
+import timeit
+import numpy as np
+import pandas as pd
+from understat.features import STATS, build_features
+
+TEAMS = [f"Team {i}" for i in range(20)]
+N = 3
+REPEAT = 5
+NUMBER = 3
+
+
+def make_season(teams=TEAMS, seed=0) -> pd.DataFrame:
+    """Double round-robin season in team-match layout, with random stats"""
+    rng = np.random.default_rng(seed)
+    order = list(range(len(teams)))
+    rounds = []
+    for _ in range(len(teams) - 1):
+        half = len(order) // 2
+        rounds.append(list(zip(order[:half], order[::-1][:half])))
+        order = [order[0], order[-1]] + order[1:-1]
+
+    rows = []
+    dates = pd.date_range('2020-09-12', periods=2 * len(rounds), freq='7D')
+    for r, fixtures in enumerate(rounds + [[(a, h) for h, a in f] for f in rounds]):
+        for home, away in fixtures:
+            match_id = f"{r}-{home}-{away}"
+            for team, opp, h_a in ((home, away, 'h'), (away, home, 'a')):
+                rows.append({'team': teams[team], 'opp': teams[opp], 'match_id': match_id, 'date': dates[r],
+                             'h_a': h_a, **dict(zip(STATS, rng.random(len(STATS))))})
+
+    return pd.DataFrame(rows)
+
+
+def legacy_features(matches: pd.DataFrame, n: int):
+    """Previous loop: one Series per window, opponent looked up by list search"""
+    teams = list(matches['team'].unique())
+    history = [g.drop(columns=['team']).reset_index(drop=True) for _, g in matches.groupby('team', sort=False)]
+
+    pre_list, res_list, opp_list = [], [], []
+    for team, games in zip(teams, history):
+        for idx in range(0, games.shape[0] - n):
+            stop = idx + n
+            name = f"{team}{idx}"
+            pre_list.append(games.iloc[idx:stop].mean(numeric_only=True).rename(name))
+            next_game = games.iloc[stop]
+            res_list.append(pd.to_numeric(next_game, errors='coerce').dropna().rename(name))
+            opp_list.append(history[teams.index(next_game.opp)][idx:stop].mean(numeric_only=True).rename(name))
+
+    pre = pd.concat(pre_list, axis=1).transpose()
+    opp_pre = pd.concat(opp_list, axis=1).transpose().add_prefix("opp_")
+    return pd.concat([pre, opp_pre], axis=1), pd.concat(res_list, axis=1).loc['xG']
+
+
+def main():
+
+    matches = make_season()
+    cases = (
+        ('legacy', lambda: legacy_features(matches, N)),
+        ('rolling', lambda: build_features(matches, N)),
+    )
+
+    print(f"{len(matches)} team-match rows (one season), N = {N}")
+    base = None
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=NUMBER, repeat=REPEAT)) / NUMBER
+        base = base or best
+        print(f"{name:>10}: {best * 1e3:8.2f} ms  ({base / best:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
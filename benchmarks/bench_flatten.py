@@ -0,0 +1,47 @@
+"""Microbenchmark of dict flattening on understat team history rows, against the previous recursive flatten_dict.
+
+Run from the repository root with `python -m benchmarks.bench_flatten`
+"""
+import timeit
+import collections.abc
+from utils.gen import flatten_dict, Flattener
+
+ROW = {"h_a": "h", "xG": 1.2, "xGA": 0.4, "npxG": 1.2, "npxGA": 0.4, "ppda": {"att": 250, "def": 10},
+       "ppda_allowed": {"att": 180, "def": 20}, "deep": 7, "deep_allowed": 3, "scored": 2, "missed": 0, "xpts": 2.1,
+       "result": "w", "date": "2020-09-12 15:00:00", "wins": 1, "draws": 0, "loses": 0, "pts": 3, "npxGD": 0.8}
+ROWS = [dict(ROW, xG=i / 100) for i in range(20 * 38)]
+REPEAT = 5
+NUMBER = 20
+
+
+def legacy_flatten_dict(d, parent_key: str = '', delimiter: str = '_') -> dict:
+    """Previous recursive implementation, building an intermediate list and dict at every level"""
+    items = []
+    for k, v in d.items():
+        new_key = parent_key + delimiter + k if parent_key else k
+        if isinstance(v, collections.abc.MutableMapping):
+            items.extend(legacy_flatten_dict(v, new_key, delimiter=delimiter).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def main():
+
+    flatten = Flattener()
+    cases = (
+        ('legacy', lambda: [legacy_flatten_dict(row) for row in ROWS]),
+        ('iterative', lambda: [flatten_dict(row) for row in ROWS]),
+        ('flattener', lambda: [flatten(row) for row in ROWS]),
+    )
+
+    print(f"{len(ROWS)} team history rows (one season)")
+    base = None
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=NUMBER, repeat=REPEAT)) / NUMBER
+        base = base or best
+        print(f"{name:>10}: {best * 1e3:6.2f} ms  ({base / best:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark understat page extraction on saved fixture pages, against the previous per-variable regex/decode chain.
+
+Run from the repository root with `python -m benchmarks.bench_parser [fixture.html ...]`
+"""
+import os
+import re
+import sys
+import json
+import timeit
+from understat import parser
+
+FIXTURES = (os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'fixtures', 'understat_league.html'),)
+# Scales payloads up to roughly the size of a big league's playersData
+SCALE = 50
+REPEAT = 5
+
+
+def legacy_extract(html: str, js_vars: tuple) -> dict:
+    """Previous extractor: one DOTALL regex compiled and run per variable, then an encode/decode chain"""
+    data = {}
+    for var in js_vars:
+        found = re.compile(r"{}\s*=\s*JSON.parse(.*?)\)".format(var), flags=re.DOTALL).findall(html)
+        data[var] = json.loads(found[0][2:-1].encode().decode('unicode_escape').encode("raw_unicode_escape"))
+
+    return data
+
+
+def extract(html: str, js_vars: tuple) -> dict:
+
+    return {var: parser.var2dict(content, var) for var, content in parser.parse(html, js_vars).items()}
+
+
+def scale_page(html: str, n: int) -> str:
+    """Repeat each variable's payload n times within a javascript array"""
+    def repeat(match):
+        return f"{match.group(1)} = JSON.parse('\\x5B" + '\\x2C'.join([match.group(2)] * n) + "\\x5D')"
+
+    return parser.RE_JSON_PARSE.sub(repeat, html)
+
+
+def ascii_page(html: str) -> str:
+    """Replace non-ASCII escapes, which the legacy extractor cannot decode, for a like-for-like comparison"""
+    return re.sub(r"\\x[89A-F][0-9A-F]|\\u[0-9a-fA-F]{4}", "X", html)
+
+
+def bench(name: str, fn, html: str) -> None:
+
+    try:
+        fn(html, parser.JS_VARS)
+    except Exception as e:
+        print(f"{name:>8}: failed ({type(e).__name__}: {e})")
+        return
+
+    best = min(timeit.repeat(lambda: fn(html, parser.JS_VARS), number=1, repeat=REPEAT))
+    print(f"{name:>8}: {best * 1e3:8.2f} ms")
+
+
+def main(paths: list):
+
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            page = f.read()
+
+        scaled = scale_page(page, SCALE)
+        for label, html in (('page', page), (f'page x{SCALE}', scaled), (f'ascii page x{SCALE}', ascii_page(scaled))):
+            print(f"{os.path.basename(path)} ({label}, {len(html) / 1e6:.2f} MB)")
+            bench('legacy', legacy_extract, html)
+            bench('current', extract, html)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or FIXTURES)
@@ -0,0 +1,196 @@
+"""Pool of reusable headless Chrome drivers, for pages that need a browser to render (requires selenium)"""
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Pages loaded by a driver before it is replaced, limiting memory growth of long-lived browsers
+MAX_PAGES = 50
+# Seconds to wait for the awaited element after loading a page
+TIMEOUT = 10.
+CHROME_ARGUMENTS = ("--headless=new", "--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage",
+                    "--disable-extensions", "--disable-infobars")
+
+
+def chrome_driver(executable_path: str = None, arguments: (list, tuple) = CHROME_ARGUMENTS):
+    """Start a headless Chrome driver
+    :param executable_path: path to chromedriver, default = found by selenium
+    :param arguments: Chrome command line arguments
+    :return: selenium webdriver
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    for argument in arguments:
+        options.add_argument(argument)
+
+    service = Service(executable_path) if executable_path else Service()
+    return webdriver.Chrome(service=service, options=options)
+
+
+def wait_for_class(driver, class_name: str, timeout: float = TIMEOUT) -> None:
+    """Wait until an element of a given class is present, rather than for a fixed time
+    :param driver: selenium webdriver, with page loading
+    :param class_name: class of awaited element
+    :param timeout: seconds to wait before raising TimeoutException
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    WebDriverWait(driver, timeout).until(expected_conditions.presence_of_element_located((By.CLASS_NAME, class_name)))
+
+
+class DriverPool:
+    """Thread-safe pool of browser drivers, reused across pages and polling cycles
+
+    Drivers are started on first use, up to `size`. Each is health-checked before being handed out and replaced if it
+    has died, and is recycled after `max_pages` pages. A page failing to load or extract (e.g. no lineups yet) returns
+    the driver to the pool, only errors of a broken session quit it. Use as a context manager, exiting quits every
+    driver.
+    """
+
+    def __init__(self, size: int = 2, max_pages: int = MAX_PAGES, factory: Callable = chrome_driver):
+        """
+        :param size: maximum number of drivers, i.e. pages loaded in parallel
+        :param max_pages: pages loaded by a driver before it is replaced
+        :param factory: function taking no arguments and returning a new driver
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._pages = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        """Check driver still responds to commands"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def is_broken(error: Exception) -> bool:
+        """Check whether an error raised while using a driver means its session is broken, rather than a problem with
+        the page (e.g. waiting timed out as there are no lineups yet, or nothing to extract)"""
+        try:
+            from selenium.common.exceptions import (JavascriptException, NoSuchElementException,
+                                                    StaleElementReferenceException, TimeoutException,
+                                                    WebDriverException)
+        except ImportError:
+            return False
+
+        page_errors = (JavascriptException, NoSuchElementException, StaleElementReferenceException, TimeoutException)
+        return isinstance(error, WebDriverException) and not isinstance(error, page_errors)
+
+    def _start(self):
+        """Start a new driver"""
+        driver = self.factory()
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _quit(self, driver) -> None:
+        """Quit driver, logging rather than raising if it has already died"""
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning("Failed to quit driver cleanly (%r)", e)
+
+    @contextmanager
+    def driver(self):
+        """Borrow a healthy driver for loading one page, waiting for one to be free if all are in use"""
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        self._slots.acquire()
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._start()
+
+            if not self.is_healthy(driver):
+                logger.warning("Replacing unresponsive driver")
+                self._quit(driver)
+                driver = self._start()
+
+            try:
+                yield driver
+            except Exception as e:
+                if self.is_broken(e):
+                    # Session state is unknown (e.g. a crashed tab), start afresh next time
+                    self._quit(driver)
+                else:
+                    # Page errors leave the driver usable, and a dead one is replaced by the next health check
+                    self._release(driver)
+                raise
+
+            self._release(driver)
+        finally:
+            self._slots.release()
+
+    def _release(self, driver) -> None:
+        """Return driver to the idle drivers after loading a page, or quit it once it has loaded max_pages"""
+        self._pages[id(driver)] += 1
+        if self._closed or self._pages[id(driver)] >= self.max_pages:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+
+    def scrape(self, url: str, extract: Callable, wait: Callable = None):
+        """Load a page and extract data from it
+        :param url: page url
+        :param extract: function taking driver and returning extracted data
+        :param wait: function taking driver, returning once page is ready (e.g. see wait_for_class), default = none
+        :return: result of extract
+        """
+        with self.driver() as driver:
+            driver.get(url)
+            if wait is not None:
+                wait(driver)
+
+            return extract(driver)
+
+    def scrape_all(self, urls: Iterable[str], extract: Callable, wait: Callable = None) -> List:
+        """Load pages in parallel, one per driver, and extract data from each
+        :param urls: page urls
+        :param extract: function taking driver and returning extracted data
+        :param wait: function taking driver, returning once page is ready, default = none
+        :return: list of extracted data, or the exception raised, in order of urls
+        """
+        urls = list(urls)
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='driver') as executor:
+            futures = [executor.submit(self.scrape, url, extract, wait) for url in urls]
+
+        results = []
+        for url, future in zip(urls, futures):
+            error = future.exception()
+            if error is not None:
+                logger.error("Failed to scrape URL: %s (%r)", url, error)
+            results.append(error if error is not None else future.result())
+
+        return results
+
+    def close(self) -> None:
+        """Quit all idle drivers, drivers in use are quit when released"""
+        self._closed = True
+        while not self._idle.empty():
+            self._quit(self._idle.get_nowait())
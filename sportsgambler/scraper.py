@@ -1,79 +1,267 @@
-import time
-import re
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException
+import asyncio
+from functools import partial
+from html.parser import HTMLParser
 from utils.gen import get_url
+from utils.crawl import CrawlScheduler
+from sportsgambler.browser import DriverPool, wait_for_class
 
-# RE_SPAN = re.compile(r">([a-z]*)<")
-RE_SPAN = re.compile(r">(.*?)<")
 BASE_URL = "https://www.sportsgambler.com/lineups/football"
 LEAGUES = ("england-premier-league/", "france-ligue-1/")
 OUT = "test.csv"
-# TODO: Chrome version issues
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+}
+# Classes of lineup page elements
+ROW_CLASS = 'table-row-loneups'
+SIDE_CLASSES = ('lineups-home', 'lineups-away')
+TEAM_CLASS = 'fxs-team'
+FORMATION_CLASS = 'lineups-toggle-formation'
+LINE_CLASS = 'players-line'
+# Elements without an end tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Extracts every lineup row in the browser in one call, in the same layout as LineupParser.rows
+EXTRACT_JS = """
+const texts = (root, cls) => Array.from(root.getElementsByClassName(cls), e => e.textContent.trim());
+const side = (row, cls) => {
+  const el = row.getElementsByClassName(cls)[0];
+  if (!el) return [null, null];
+  const players = [], numbers = [];
+  for (const line of el.getElementsByClassName('%(line)s')) {
+    const names = [], nums = [];
+    let number = null;
+    const walker = document.createTreeWalker(line, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+      const text = walker.currentNode.nodeValue.trim();
+      if (/^[0-9]+$/.test(text)) { number = parseInt(text, 10); }
+      else if (text) { names.push(text); nums.push(number); number = null; }
+    }
+    players.push(names);
+    numbers.push(nums);
+  }
+  return [players, numbers];
+};
+return Array.from(document.getElementsByClassName('%(row)s'), row => {
+  const [home, homeNumbers] = side(row, '%(home)s');
+  const [away, awayNumbers] = side(row, '%(away)s');
+  return {teams: texts(row, '%(team)s'), formations: texts(row, '%(formation)s'),
+          players: [home, away], numbers: [homeNumbers, awayNumbers]};
+});
+""" % {'row': ROW_CLASS, 'home': SIDE_CLASSES[0], 'away': SIDE_CLASSES[1], 'team': TEAM_CLASS,
+       'formation': FORMATION_CLASS, 'line': LINE_CLASS}
 
 
-def strip(driver):
+class LineupParser(HTMLParser):
+    """Single-pass parser of a sportsgambler lineups page, collecting each match row's teams, formations and players
 
-    # TODO: Get date
-    current_date = None
+    Players are read line by line (e.g. defence, midfield) from the text within each players-line, where numeric text
+    is the shirt number of the next player. Completed rows are found in `rows`, as dicts of 'teams', 'formations',
+    and 'players' and 'numbers' by side (None where a side is missing), the same layout as returned by EXTRACT_JS.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._stack = []
+        self._row = None
+        self._side = None
+        self._line = None
+        self._number = None
+        self._text = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+
+        classes = set((dict(attrs).get('class') or '').split())
+        role = None
+
+        if ROW_CLASS in classes:
+            role = 'row'
+            self._row = {'teams': [], 'formations': [], 'players': [None, None], 'numbers': [None, None]}
+        elif self._row is not None:
+            if classes & set(SIDE_CLASSES):
+                role = 'side'
+                self._side = SIDE_CLASSES.index(min(classes & set(SIDE_CLASSES)))
+                self._row['players'][self._side] = []
+                self._row['numbers'][self._side] = []
+            elif LINE_CLASS in classes and self._side is not None:
+                role = 'line'
+                self._line = ([], [])
+                self._number = None
+            elif TEAM_CLASS in classes:
+                role = 'team'
+                self._text = []
+            elif FORMATION_CLASS in classes:
+                role = 'formation'
+                self._text = []
+
+        self._stack.append((tag, role))
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        # Tolerates unclosed elements by closing everything opened since the matching start tag
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for _, role in reversed(self._stack[i:]):
+                    self._close(role)
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+        elif self._line is not None:
+            data = data.strip()
+            # Shirt numbers are the only numeric text in a line, and precede the player's name
+            if data.isdigit():
+                self._number = int(data)
+            elif data:
+                self._line[0].append(data)
+                self._line[1].append(self._number)
+                self._number = None
+
+    def _close(self, role):
+        if role == 'row':
+            self.rows.append(self._row)
+            self._row = self._side = None
+        elif role == 'side':
+            self._side = None
+        elif role == 'line':
+            self._row['players'][self._side].append(self._line[0])
+            self._row['numbers'][self._side].append(self._line[1])
+            self._line = None
+        elif role in ('team', 'formation'):
+            self._row[f"{role}s"].append(''.join(self._text).strip())
+            self._text = None
+
+
+def row_error(row: dict):
+    """Find what is missing from an extracted lineup row
+    :param row: row as extracted by LineupParser or EXTRACT_JS
+    :return: description of first problem found, None if row is complete
+    """
+    if len(row['teams']) < 2:
+        return f"expected 2 teams, found {len(row['teams'])}"
+    for side, cls in enumerate(SIDE_CLASSES):
+        if row['players'][side] is None:
+            return f"no '{cls}' element"
+        if not any(row['players'][side]):
+            return f"no players in '{cls}'"
+    if len(row['formations']) < 2:
+        return f"expected 2 formations, found {len(row['formations'])}"
 
-    # Get table containing matches
-    table = driver.find_elements_by_class_name('table-row-loneups')
-    h_a = ('lineups-home', 'lineups-away')
+    return None
 
-    count = 0
+
+def lineups_from_rows(rows: list, errors: list = None) -> tuple:
+    """Convert extracted lineup rows to home and away lineups, reporting each row that cannot be used
+    :param rows: rows as extracted by LineupParser or EXTRACT_JS
+    :param errors: option to collect {'row', 'teams', 'error'} dicts of rows that were skipped
+    :return: home and away lineups, each a list of {'team', 'formation', 'players', 'numbers'} dicts with players (and
+        their shirt numbers, None if not shown) as a list per line
+    """
     h = []
     a = []
-    for row in table:
+    for i, row in enumerate(rows):
+        error = row_error(row)
+        if error is not None:
+            # Usually a match whose lineups are not published yet
+            print(f"Skipping lineup row {i} {row['teams']}: {error}")
+            if errors is not None:
+                errors.append({'row': i, 'teams': row['teams'], 'error': error})
+            continue
 
-        try:
-            home = row.find_element_by_class_name(h_a[0])
-            away = row.find_element_by_class_name(h_a[1])
-            teams = [t.get_attribute('innerHTML') for t in row.find_elements_by_class_name('fxs-team')]
-            forms = [f.get_attribute('innerHTML') for f in row.find_elements_by_class_name('lineups-toggle-formation')]
+        for side, lineups in enumerate((h, a)):
+            lineups.append({'team': row['teams'][side], 'formation': row['formations'][side],
+                            'players': row['players'][side], 'numbers': row['numbers'][side]})
 
-            home_players = get_players(home)
-            away_players = get_players(away)
+    return h, a
 
-            h.append({'team': teams[0], 'formation': forms[0], 'players': home_players})
-            a.append({'team': teams[1], 'formation': forms[1], 'players': away_players})
 
-        except NoSuchElementException:
+def parse_lineups(html: str, errors: list = None) -> tuple:
+    """Parse lineups page without a browser
+    :param html: page html
+    :param errors: option to collect rows that were skipped, see lineups_from_rows
+    :return: home and away lineups, see lineups_from_rows
+    """
+    parser = LineupParser()
+    parser.feed(html)
+    parser.close()
 
-            count += 1
-            if count == 5:
-                break
+    return lineups_from_rows(parser.rows, errors)
 
-    return h, a
 
+async def fetch_lineups(leagues: (list, tuple) = LEAGUES, base_url: str = BASE_URL, scheduler: CrawlScheduler = None,
+                        **kwargs) -> dict:
+    """Fetch and parse lineups pages of all leagues concurrently
+    :param leagues: league url segments, appended to base_url
+    :param base_url: url of lineups pages
+    :param scheduler: crawl scheduler, default = CrawlScheduler()
+    :param kwargs: passed to session request, default headers = HEADERS
+    :return: dict of (home, away) lineups by league, leagues that could not be fetched are left out
+    """
+    scheduler = scheduler or CrawlScheduler()
+    kwargs.setdefault('headers', HEADERS)
 
-def get_players(team):
+    async with scheduler:
+        urls = [get_url(league, base_url=base_url) for league in leagues]
+        pages = await asyncio.gather(*[scheduler.fetch(url, **kwargs) for url in urls], return_exceptions=True)
 
-    lines = team.find_elements_by_class_name('players-line')
-    # TODO: Not very clean way of getting rid of player numbers, get regex to find names only
-    players = [RE_SPAN.findall(line.get_attribute('innerHTML'))[1::2] for line in lines]
+    lineups = {}
+    for league, page in zip(leagues, pages):
+        if isinstance(page, Exception):
+            print(f"Failed to fetch lineups for league: {league} ({page!r})")
+            continue
 
-    return players
+        lineups[league] = parse_lineups(page)
 
+    return lineups
 
-def main():
-    web = get_url(LEAGUES[0], base_url=BASE_URL)
-    # path = 'C:/Users/andre/Downloads/chromedriver_win32/chromedriver'  # introduce your file's path inside
 
-    options = Options()
-    # options.add_argument("start-maximized")
-    options.add_argument("disable-infobars")
-    options.add_argument("--disable-extensions")
-    driver = webdriver.Chrome(
-        options=options,
-        executable_path='C:/Users/andre/Downloads/chromedriver_win32/chromedriver.exe')
+def strip(driver, mode: str = 'script', errors: list = None) -> tuple:
+    """Extract lineups from a loaded page in a single round trip to the browser
+    :param driver: selenium webdriver, with lineups page loaded
+    :param mode: 'script' to extract rows in the browser with EXTRACT_JS, or 'source' to read the rendered page source
+        once and parse it locally
+    :param errors: option to collect rows that were skipped, see lineups_from_rows
+    :return: home and away lineups, see lineups_from_rows
+    """
+    # TODO: Get date
+    if mode == 'script':
+        return lineups_from_rows(driver.execute_script(EXTRACT_JS), errors)
+    elif mode == 'source':
+        return parse_lineups(driver.page_source, errors)
 
-    driver.get(web)
-    time.sleep(0.5)
-    h, a = strip(driver)
+    raise ValueError(f"Invalid mode '{mode}'. Expected one of: ('script', 'source')")
 
-    return h, a
+
+def browser_lineups(leagues: (list, tuple) = LEAGUES, pool: DriverPool = None) -> dict:
+    """Fallback scraping lineups with headless Chrome, for pages that need javascript to render (requires selenium)
+    :param leagues: league url segments, appended to BASE_URL
+    :param pool: driver pool, pass one to reuse its drivers across polling cycles, default = new pool closed on return
+    :return: dict of (home, away) lineups by league, leagues that could not be scraped are left out
+    """
+    own_pool = pool is None
+    pool = pool or DriverPool()
+
+    try:
+        urls = [get_url(league, base_url=BASE_URL) for league in leagues]
+        results = pool.scrape_all(urls, strip, wait=partial(wait_for_class, class_name=ROW_CLASS))
+    finally:
+        if own_pool:
+            pool.close()
+
+    return {league: result for league, result in zip(leagues, results) if not isinstance(result, Exception)}
+
+
+def main(browser: bool = False):
+
+    if browser:
+        return browser_lineups()
+
+    return asyncio.run(fetch_lineups())
 
 
 if __name__ == '__main__':
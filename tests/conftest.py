@@ -0,0 +1,45 @@
+import time
+import pytest
+from sportsgambler import scraper
+
+
+class FakeDriver:
+    """Stands in for a selenium webdriver, serving pages by url"""
+
+    def __init__(self, started: list, pages: dict = None):
+        self.pages = pages or {}
+        self.alive = True
+        self.page = None
+        self.page_source = None
+        self.quit_called = False
+        started.append(self)
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("driver died")
+        if script == scraper.EXTRACT_JS:
+            # Stands in for EXTRACT_JS run in a browser, which gives rows in the same layout as LineupParser
+            parser = scraper.LineupParser()
+            parser.feed(self.page_source)
+            return parser.rows
+        return 1
+
+    def get(self, url):
+        time.sleep(0.02)
+        self.page = url
+        self.page_source = self.pages.get(url, "")
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def started() -> list:
+    """Fake drivers started by fake_driver, in order"""
+    return []
+
+
+@pytest.fixture
+def fake_driver(started):
+    """Factory of fake drivers, taking an optional dict of page html by url"""
+    return lambda pages=None: FakeDriver(started, pages)
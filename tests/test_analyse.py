@@ -0,0 +1,32 @@
+import pytest
+import pandas as pd
+from understat import analyse
+
+
+MATCHES = pd.DataFrame({
+    "id": [10, 11], "datetime": ["2020-09-12 15:00:00", "2020-09-19 15:00:00"],
+    "h_id": [1, 2], "h_title": ["Arsenal", "Chelsea"], "a_id": [2, 1], "a_title": ["Chelsea", "Arsenal"],
+    "goals_h": [2, 1], "goals_a": [0, 1], "xG_h": [2.0, 1.5], "xG_a": [0.5, 1.0],
+})
+GAMES = pd.DataFrame({
+    "team": ["Arsenal", "Arsenal", "Chelsea"],
+    "date": ["2020-09-12 15:00:00", "2020-09-19 15:00:00", "2020-09-12 15:00:00"],
+    "h_a": ["h", "a", "a"],
+})
+
+
+def test_attach_matches():
+
+    games = analyse.attach_matches(GAMES, MATCHES)
+
+    assert games["opp"].tolist() == ["Chelsea", "Chelsea", "Arsenal"]
+    assert games["match_id"].tolist() == [10, 11, 10]
+    assert games["goals_for"].tolist() == [2, 1, 0]
+    assert games["xG_against"].tolist() == [0.5, 1.5, 2.0]
+
+
+def test_attach_matches_mismatch():
+
+    games = GAMES.assign(h_a=["a", "a", "a"])
+    with pytest.raises(ValueError):
+        analyse.attach_matches(games, MATCHES)
@@ -0,0 +1,86 @@
+import time
+import threading
+import pytest
+from sportsgambler.browser import DriverPool
+
+
+def test_reuse_and_recycle(fake_driver, started):
+
+    pool = DriverPool(factory=fake_driver, size=1, max_pages=2)
+    pages = [pool.scrape(f"page{i}", lambda d: d.page) for i in range(3)]
+
+    assert pages == ["page0", "page1", "page2"]
+    # First driver is recycled after two pages
+    assert len(started) == 2
+    assert started[0].quit_called and not started[1].quit_called
+
+    pool.close()
+    assert started[1].quit_called
+
+
+def test_health_check(fake_driver, started):
+
+    pool = DriverPool(factory=fake_driver, size=1)
+    pool.scrape("page", lambda d: None)
+    started[0].alive = False
+
+    assert pool.scrape("page", lambda d: d is started[1])
+    assert started[0].quit_called
+
+
+def test_scrape_all(fake_driver, started):
+
+    pool = DriverPool(factory=fake_driver, size=3)
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def wait(driver):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+
+    def extract(driver):
+        if driver.page == "bad":
+            raise ValueError("no lineups")
+        return driver.page
+
+    with pool:
+        results = pool.scrape_all(["a", "bad", "c", "d", "e"], extract, wait)
+
+    assert results[0] == "a" and results[2:] == ["c", "d", "e"]
+    assert isinstance(results[1], ValueError)
+    # Pages load in parallel, never on more drivers than the pool size
+    assert 1 < state["peak"] <= 3
+    assert all(d.quit_called for d in started)
+    with pytest.raises(RuntimeError):
+        pool.scrape("a", lambda d: None)
+
+
+@pytest.mark.parametrize("broken", [False, True])
+def test_page_error(fake_driver, started, monkeypatch, broken):
+
+    monkeypatch.setattr(DriverPool, "is_broken", staticmethod(lambda error: broken))
+    pool = DriverPool(factory=fake_driver, size=1)
+
+    def extract(driver):
+        raise ValueError("no lineups")
+
+    with pytest.raises(ValueError):
+        pool.scrape("page", extract)
+    pool.scrape("page", lambda d: None)
+
+    # Driver is kept after a page error, and only replaced if its session is broken
+    assert len(started) == (2 if broken else 1)
+    assert started[0].quit_called == broken
+
+
+def test_is_broken():
+
+    exceptions = pytest.importorskip("selenium.common.exceptions")
+
+    assert not DriverPool.is_broken(exceptions.TimeoutException())
+    assert not DriverPool.is_broken(ValueError())
+    assert DriverPool.is_broken(exceptions.InvalidSessionIdException())
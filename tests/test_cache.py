@@ -0,0 +1,47 @@
+import os
+from utils.cache import ArtifactCache
+
+
+def test_key(tmp_path):
+
+    data = tmp_path / "data.csv"
+    data.write_text("a,b\n1,2\n")
+    cache = ArtifactCache(str(tmp_path / "cache"))
+
+    key = cache.key([str(data)], n=3)
+    assert cache.key([str(data)], n=3) == key
+    assert cache.key([str(data)], n=4) != key
+
+    data.write_text("a,b\n1,3\n")
+    stat = os.stat(data)
+    os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.key([str(data)], n=3) != key
+
+
+def test_get_or_compute(tmp_path):
+
+    cache = ArtifactCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"coef": [1.0, 2.0]}
+
+    assert cache.get_or_compute("k", compute) == {"coef": [1.0, 2.0]}
+    assert cache.get_or_compute("k", compute) == {"coef": [1.0, 2.0]}
+    assert len(calls) == 1
+
+
+def test_lru_eviction(tmp_path):
+
+    cache = ArtifactCache(str(tmp_path), max_entries=2)
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, key)
+        os.utime(tmp_path / f"{key}.pkl", ns=(i, i))
+
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "a"
+    cache.put("c", "c")
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in ("a", "c")] == ["a", "c"]
@@ -0,0 +1,44 @@
+import os
+from understat.catalog import DataCatalog
+from utils.storage import write_table
+
+
+def make_season(root, league, year, teams):
+
+    path = root / league / year
+    path.mkdir(parents=True)
+    write_table([{"id": i, "title": t} for i, t in enumerate(teams)], str(path / "teamsData.csv"))
+    return path
+
+
+def bump_mtime(path):
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_catalog_index(tmp_path):
+
+    make_season(tmp_path, "EPL", "2020", ["Arsenal", "Aston Villa"])
+    catalog = DataCatalog(str(tmp_path))
+
+    assert catalog.leagues() == ["EPL"]
+    assert catalog.seasons("EPL") == ["2020"]
+    assert catalog.teams("EPL", "2020", "teamsData.csv") == ["Arsenal", "Aston Villa"]
+    assert catalog.file_path("EPL", "2020", "playersData.csv") is None
+    assert catalog.season_path("La_liga", "2020") is None
+
+
+def test_catalog_invalidation(tmp_path):
+
+    path = make_season(tmp_path, "EPL", "2020", ["Arsenal"])
+    catalog = DataCatalog(str(tmp_path))
+    assert catalog.teams("EPL", "2020", "teamsData.csv") == ["Arsenal"]
+
+    write_table([{"id": 1, "title": "Chelsea"}], str(path / "teamsData.csv"))
+    bump_mtime(path / "teamsData.csv")
+    assert catalog.teams("EPL", "2020", "teamsData.csv") == ["Chelsea"]
+
+    make_season(tmp_path, "EPL", "2021", ["Chelsea"])
+    bump_mtime(tmp_path / "EPL")
+    assert sorted(catalog.seasons("EPL")) == ["2020", "2021"]
@@ -0,0 +1,79 @@
+import time
+import asyncio
+import pytest
+from aiohttp import web, ClientResponseError
+from aiohttp.test_utils import TestServer
+from utils.crawl import CrawlScheduler, TokenBucket
+
+
+def make_app(state: dict) -> web.Application:
+
+    async def flaky(request):
+        state["flaky"] = state.get("flaky", 0) + 1
+        if state["flaky"] <= 2:
+            return web.Response(status=503)
+        return web.Response(text="ok")
+
+    async def broken(request):
+        return web.Response(status=404)
+
+    async def slow(request):
+        state["active"] = state.get("active", 0) + 1
+        state["peak"] = max(state.get("peak", 0), state["active"])
+        await asyncio.sleep(0.05)
+        state["active"] -= 1
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/broken", broken)
+    app.router.add_get("/slow/{i}", slow)
+    return app
+
+
+async def crawl(paths: list, **kwargs) -> tuple:
+
+    state = {}
+    async with TestServer(make_app(state)) as server:
+        async with CrawlScheduler(**kwargs) as scheduler:
+            urls = [str(server.make_url(p)) for p in paths]
+            results = await asyncio.gather(*[scheduler.fetch(url) for url in urls], return_exceptions=True)
+
+    return results, state, scheduler
+
+
+def test_retry_transient():
+
+    results, state, _ = asyncio.run(crawl(["/flaky"], backoff=0.01, rate=100))
+
+    assert results == ["ok"]
+    assert state["flaky"] == 3
+
+
+def test_partial_failure():
+
+    results, _, scheduler = asyncio.run(crawl(["/broken", "/slow/1"], backoff=0.01, rate=100))
+
+    assert isinstance(results[0], ClientResponseError)
+    assert results[1] == "ok"
+    assert [url.rsplit("/", 1)[1] for url in scheduler.failures] == ["broken"]
+
+
+def test_concurrency_limit():
+
+    _, state, _ = asyncio.run(crawl([f"/slow/{i}" for i in range(8)], per_host=2, rate=1000, burst=8))
+
+    assert state["peak"] == 2
+
+
+@pytest.mark.parametrize("rate, n", [(50, 6)])
+def test_token_bucket(rate, n):
+
+    async def acquire_all():
+        bucket = TokenBucket(rate)
+        for _ in range(n):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+    assert time.monotonic() - start >= (n - 1) / rate * 0.9
@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+import pandas as pd
+from understat.features import STATS, build_features, rolling_form
+
+# Three rounds between three teams, one team resting each round
+MATCHES = pd.DataFrame({
+    "team": ["A", "B", "A", "C", "B", "C"],
+    "opp": ["B", "A", "C", "A", "C", "B"],
+    "match_id": ["1", "1", "2", "2", "3", "3"],
+    "date": pd.to_datetime(["2020-09-01", "2020-09-01", "2020-09-08", "2020-09-08", "2020-09-15", "2020-09-15"]),
+    "h_a": ["h", "a", "h", "a", "h", "a"],
+    "xG": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+})
+
+
+def test_rolling_form():
+
+    form = rolling_form(MATCHES, 1, ["xG"]).sort_index()
+    # Form going into each game is the previous game of the same team only
+    np.testing.assert_array_equal(form["xG"], [np.nan, np.nan, 1.0, np.nan, 2.0, 4.0])
+
+
+@pytest.mark.parametrize(
+    "location, expected",
+    [
+        (None, {("B", "3"): (5.0, 2.0, 4.0), ("C", "3"): (6.0, 4.0, 2.0)}),
+        ("home", {}),
+    ]
+)
+def test_build_features(location, expected):
+
+    X, y = build_features(MATCHES, 1, ["xG"], location=location)
+
+    assert list(X.columns) == ["xG", "opp_xG"]
+    assert {k: (y[k], *X.loc[k]) for k in X.index} == expected
+
+
+def test_stats_distinct():
+
+    # Match columns duplicate history stats exactly, which would make features collinear
+    assert not {"goals_for", "goals_against", "xG_for", "xG_against"} & set(STATS)
+    assert len(set(STATS)) == len(STATS)
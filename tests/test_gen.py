@@ -0,0 +1,40 @@
+import pytest
+from utils import gen
+
+
+ROW = {"h_a": "h", "xG": 1.2, "ppda": {"att": 250, "def": 10}, "ppda_allowed": {"att": 180, "def": 20}, "date": "d"}
+FLAT = {"h_a": "h", "xG": 1.2, "ppda_att": 250, "ppda_def": 10, "ppda_allowed_att": 180, "ppda_allowed_def": 20,
+        "date": "d"}
+
+
+def test_flatten_dict():
+
+    flat = gen.flatten_dict({"a": {"b": {"c": 1}, "d": 2}, "e": 3})
+    assert list(flat.items()) == [("a_b_c", 1), ("a_d", 2), ("e", 3)]
+
+
+def test_flatten_list():
+
+    assert gen.flatten_list([1, [2, [3, [4]], 5], [], 6]) == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        ROW,
+        {**ROW, "extra": 1},
+        {**ROW, "ppda": 5},
+        {**ROW, "ppda": {"att": 250}},
+        # Same shape, renamed keys
+        {"h_a": "h", "xG": 1.2, "ppda": {"att": 250, "def": 10}, "ppda_against": {"att": 180, "def": 20}, "date": "d"},
+        {**ROW, "ppda": {"att": 250, "deff": 10}},
+        # Leaf that has become a dict
+        {**ROW, "xG": {"deep": 1}},
+        {**ROW, "ppda": {"att": 250, "def": {"deep": 10}}},
+    ]
+)
+def test_flattener(row):
+
+    flatten = gen.Flattener()
+    assert flatten(ROW) == FLAT
+    assert list(flatten(row).items()) == list(gen.flatten_dict(row).items())
@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cumulative import time budget for understat.models, in seconds (pandas alone accounts for most of it)
+IMPORT_BUDGET = 1.5
+LAZY_MODULES = ("matplotlib", "sklearn", "aiohttp")
+
+
+def run(code: str, *args: str) -> subprocess.CompletedProcess:
+
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def test_import_time_budget():
+
+    # -X importtime reports cumulative microseconds per module on stderr, "import time: self | cumulative | name"
+    result = run("import understat.models", "-X", "importtime")
+    times = {line.split("|")[2].strip(): int(line.split("|")[1]) for line in result.stderr.splitlines()
+             if line.startswith("import time:") and line.split("|")[1].strip().isdigit()}
+
+    assert times["understat.models"] / 1e6 < IMPORT_BUDGET
+
+
+def test_lazy_imports():
+
+    code = "import sys, understat.models, understat.analyse as a; print(len(a.CATALOG._cache), *sys.modules)"
+    cached, *modules = run(code).stdout.split()
+
+    assert cached == "0"
+    assert not [m for m in modules if m.split(".")[0] in LAZY_MODULES]
@@ -0,0 +1,31 @@
+from understat.manifest import CrawlManifest
+
+URL = "https://understat.com/league/EPL/2020"
+
+
+def test_manifest_change_detection(tmp_path):
+
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    manifest.stage_validators(URL, {"ETag": '"abc"'})
+    manifest.stage(URL, "datesData", "[1, 2]")
+    manifest.stage(URL, "teamsData", "[3]")
+    assert manifest.changed(URL) == {"datesData", "teamsData"}
+
+    manifest.commit(URL)
+    manifest.save()
+
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    assert manifest.headers(URL) == {"If-None-Match": '"abc"'}
+
+    manifest.stage(URL, "datesData", "[1, 2]")
+    manifest.stage(URL, "teamsData", "[3, 4]")
+    assert manifest.changed(URL) == {"teamsData"}
+
+
+def test_manifest_uncommitted(tmp_path):
+
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    manifest.stage(URL, "datesData", "[1, 2]")
+    manifest.save()
+
+    assert CrawlManifest(str(tmp_path / "manifest.json")).entries == {}
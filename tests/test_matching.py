@@ -0,0 +1,74 @@
+import pytest
+from utils import gen
+from utils.matching import NameMatcher, normalise
+
+PLAYERS = ["Mohamed Salah", "Heung-Min Son", "Łukasz Fabiański", "Rúben Dias", "Harry Kane", "Harry Maguire"]
+
+
+def test_normalise():
+
+    assert normalise("  Rúben   DIAS ") == "ruben dias"
+    assert normalise("Heung-Min Son") == "heung min son"
+
+
+@pytest.mark.parametrize(
+    "query, match, exact",
+    [
+        ("Mohamed Salah", "Mohamed Salah", True),
+        ("Ruben Dias", "Rúben Dias", True),
+        ("Heung Min Son", "Heung-Min Son", True),
+        ("Harry Kan", "Harry Kane", False),
+        ("Lukasz Fabianski", "Łukasz Fabiański", False),
+        # Unique surname, and surname with initial
+        ("Maguire", "Harry Maguire", True),
+        ("H. Kane", "Harry Kane", True),
+        # Initial not matching first name is compared in full
+        ("R. Maguire", "Harry Maguire", False),
+    ]
+)
+def test_match(query, match, exact):
+
+    found, ratio = NameMatcher(PLAYERS, tol=0.9).match(query)
+
+    assert found == match
+    assert (ratio == 1.0) == exact
+
+
+@pytest.mark.parametrize(
+    "query, match, exact",
+    [
+        ("Brighton & Hove Albion", "Brighton", True),
+        ("West Ham United", "West Ham", True),
+        ("Manchester United", "Manchester United", True),
+        ("Manchester Utd", "Manchester United", False),
+    ]
+)
+def test_match_prefixes(query, match, exact):
+
+    teams = ["Brighton", "West Ham", "Manchester City", "Manchester United"]
+    found, ratio = NameMatcher(teams, prefixes=True).match(query)
+
+    assert found == match
+    assert (ratio == 1.0) == exact
+    # Only matched by leading words if asked to
+    assert NameMatcher(teams).match("Brighton & Hove Albion")[1] < 1.0
+
+
+def test_aliases(tmp_path):
+
+    path = str(tmp_path / "aliases.json")
+    matcher = NameMatcher(PLAYERS, aliases_path=path, tol=0.9)
+    matches = [m for m, _ in matcher.match_all(["Harry Kan", "M. Salah", "Harold Kone", "Harry Kan"])]
+    assert matches == ["Harry Kane", "Mohamed Salah", "Harry Kane", "Harry Kane"]
+
+    matcher.add_alias("Mo Salah", "Mohamed Salah")
+    matcher.save()
+
+    # Confident and hand-added matches are remembered, low ratio matches are not
+    aliases = NameMatcher(PLAYERS, aliases_path=path).aliases
+    assert aliases == {"Harry Kan": "Harry Kane", "M. Salah": "Mohamed Salah", "Mo Salah": "Mohamed Salah"}
+
+
+def test_fuzzy_string_match_exact():
+
+    assert gen.fuzzy_string_match("Harry Kane", PLAYERS) == ("Harry Kane", 1.0)
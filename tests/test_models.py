@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from understat.models import fit_model
+from understat.plots import plot_correlations
+
+WEIGHTS = {"xG": 0.5, "opp_xGA": 0.3, "deep": 0.0}
+
+
+def make_data(rows=50, seed=0):
+
+    rng = np.random.default_rng(seed)
+    inp = pd.DataFrame(rng.random((rows, len(WEIGHTS))), columns=list(WEIGHTS))
+    out = (inp * pd.Series(WEIGHTS)).sum(axis=1).rename("xG")
+    return inp, out
+
+
+def test_fit_model():
+
+    results = fit_model(*make_data(), cv=5)
+
+    assert results["rmse"] < 1e-9
+    assert results["cv_rmse"].shape == (5,)
+    assert results["coefficients"].index.tolist() == ["xG", "opp_xGA", "deep"]
+    assert len(results["y_pred"]) == len(results["X_test"]) == 10
+
+
+def test_plot_correlations(tmp_path):
+
+    results = dict(fit_model(*make_data(), cv=5), n=3, target="xG")
+    path = tmp_path / "correlations.png"
+
+    fig = plot_correlations(results, path=str(path), n_plot=2)
+
+    assert path.stat().st_size > 0
+    assert len(fig.axes) == 3
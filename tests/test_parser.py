@@ -0,0 +1,185 @@
+import os
+import json
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from understat import parser
+from understat.manifest import CrawlManifest
+from utils.crawl import CrawlScheduler
+from utils.storage import WriterPool
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "understat_league.html")
+
+
+DATES = [
+    {"id": "10", "datetime": "2020-09-12 15:00:00",
+     "h": {"id": "1", "title": "Arsenal"}, "a": {"id": "2", "title": "Chelsea"},
+     "goals": {"h": "2", "a": "0"}, "xG": {"h": "2.0", "a": "0.5"}},
+    {"id": "11", "datetime": "2020-09-19 15:00:00",
+     "h": {"id": "2", "title": "Chelsea"}, "a": {"id": "1", "title": "Arsenal"},
+     "goals": {"h": "1", "a": "1"}, "xG": {"h": "1.5", "a": "1.0"}},
+]
+TEAMS = {
+    "2": {"id": "2", "title": "Chelsea", "history": [
+        {"h_a": "a", "xG": 0.5, "ppda": {"att": 100, "def": 10}, "date": "2020-09-12 15:00:00"},
+        {"h_a": "h", "xG": 1.5, "ppda": {"att": 200, "def": 20}, "date": "2020-09-19 15:00:00"},
+    ]},
+    "1": {"id": "1", "title": "Arsenal", "history": [
+        {"h_a": "h", "xG": 2.0, "ppda": {"att": 150, "def": 15}, "date": "2020-09-12 15:00:00"},
+        {"h_a": "a", "xG": 1.0, "ppda": {"att": 250, "def": 25}, "date": "2020-09-19 15:00:00"},
+    ]},
+}
+
+
+def test_build_team_matches():
+
+    rows = parser.build_team_matches(DATES, TEAMS)
+
+    assert [(r["team"], r["opp"], r["match_id"]) for r in rows] == [
+        ("Arsenal", "Chelsea", "10"), ("Arsenal", "Chelsea", "11"),
+        ("Chelsea", "Arsenal", "10"), ("Chelsea", "Arsenal", "11"),
+    ]
+    assert rows[0]["ppda_att"] == 150
+    assert (rows[0]["goals_for"], rows[0]["xG_against"]) == ("2", "0.5")
+
+
+def test_build_team_matches_missing_fixture():
+
+    with pytest.raises(ValueError):
+        parser.build_team_matches(DATES[:1], TEAMS)
+
+
+def test_parse_single_scan():
+
+    html = ("<script>var datesData\t= JSON.parse('[1]');</script>"
+            "<script>var teamsData = JSON.parse('{}');var other = JSON.parse('2');</script>")
+    found = parser.parse(html, parser.JS_VARS)
+
+    assert found == {"datesData": "[1]", "teamsData": "{}"}
+    assert parser.var2dict(found["datesData"]) == [1]
+
+
+def test_parse_escaped_quote():
+
+    html = r"var datesData = JSON.parse('[\x22it\'s\')\x22]');"
+    found = parser.parse(html, ("datesData",))
+
+    assert parser.var2dict(found["datesData"]) == ["it's')"]
+
+
+def test_parse_fixture_page():
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        found = parser.parse(f.read(), parser.JS_VARS)
+
+    data = {var: parser.var2dict(content, var) for var, content in found.items()}
+    names = {p["player_name"].rsplit(" ", 1)[0] for p in data["playersData"]}
+
+    assert set(data) == set(parser.JS_VARS)
+    assert {"N'Golo Kanté", "Łukasz Fabiański", "Ñoño"} <= names
+
+
+@pytest.mark.parametrize("content", [r"[\x7B\x22a\x22\x3A", r"[1, 2\x5", "[1, 2\\"])
+def test_var2dict_malformed(content):
+
+    with pytest.raises(ValueError, match="datesData"):
+        parser.var2dict(content, "datesData")
+
+
+def make_page(players: list) -> str:
+
+    variables = {"datesData": DATES, "playersData": players, "teamsData": TEAMS}
+    return "".join(f"<script>var {var} = JSON.parse('{json.dumps(data)}');</script>" for var, data in variables.items())
+
+
+def make_app(state: dict) -> web.Application:
+
+    async def league(request):
+        state["headers"].append(dict(request.headers))
+        state["requests"][request.path] = state["requests"].get(request.path, 0) + 1
+        if request.match_info["league"] not in ("EPL", "La_liga"):
+            return web.Response(status=404)
+        if request.headers.get("If-None-Match") == state["etag"]:
+            return web.Response(status=304)
+        return web.Response(text=state["page"], content_type="text/html", headers={"ETag": state["etag"]})
+
+    app = web.Application()
+    app.router.add_get("/league/{league}/{year}", league)
+    return app
+
+
+def test_incremental_crawl(tmp_path, monkeypatch):
+
+    written = []
+    write_one = parser.write_one
+    monkeypatch.setattr(parser, "write_one", lambda url, var, *args: written.append(var) or write_one(url, var, *args))
+
+    state = {"etag": '"v1"', "page": make_page([{"id": "1", "player_name": "Alpha"}]), "headers": [], "requests": {}}
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    path = str(tmp_path / "EPL" / "2020")
+
+    async def crawl_passes():
+        async with TestServer(make_app(state)) as server:
+            urls = [str(server.make_url("/league/EPL/2020"))]
+            passes = []
+            for etag, players in (('"v1"', None), ('"v1"', None), ('"v2"', [{"id": "1", "player_name": "Beta"}]),
+                                  ('"v3"', None), ('"v3"', None)):
+                state["etag"] = etag
+                if players is not None:
+                    state["page"] = make_page(players)
+
+                written.clear()
+                await parser.bulk_crawl_and_write(urls, [path], parser.JS_VARS, manifest=manifest,
+                                                  scheduler=CrawlScheduler(rate=100))
+                passes.append(list(written))
+        return urls[0], passes
+
+    url, (first, unchanged, changed, revalidated, not_modified) = asyncio.run(crawl_passes())
+
+    # The page is fetched once per crawl for all variables
+    assert state["requests"] == {"/league/EPL/2020": 5}
+    assert "If-None-Match" not in state["headers"][0]
+    assert state["headers"][1]["If-None-Match"] == '"v1"'
+    assert sorted(first) == sorted([parser.TEAM_MATCHES, *parser.JS_VARS])
+    # Not modified, nothing is rewritten
+    assert unchanged == []
+    # Only the variable whose content changed is rewritten
+    assert changed == ["playersData"]
+    assert "Beta" in (tmp_path / "EPL" / "2020" / "playersData.csv").read_text()
+    # A new ETag with unchanged content rewrites nothing, but the new ETag is sent next time
+    assert revalidated == not_modified == []
+    assert state["headers"][4]["If-None-Match"] == '"v3"'
+    assert CrawlManifest(str(tmp_path / "manifest.json")).headers(url) == {"If-None-Match": '"v3"'}
+
+
+def test_bulk_crawl_writer_pool(tmp_path, monkeypatch):
+
+    threads = []
+    write_all = parser.write_all
+    monkeypatch.setattr(parser, "write_all",
+                        lambda *args: threads.append(threading.current_thread().name) or write_all(*args))
+
+    state = {"etag": '"v1"', "page": make_page([{"id": "1", "player_name": "Alpha"}]), "headers": [], "requests": {}}
+    paths = ["/league/EPL/2020", "/league/La_liga/2020", "/league/broken/2020"]
+
+    async def crawl():
+        async with TestServer(make_app(state)) as server:
+            urls = [str(server.make_url(p)) for p in paths]
+            failed = await parser.bulk_crawl_and_write(urls, [str(tmp_path / p.strip("/")) for p in paths],
+                                                       parser.JS_VARS, scheduler=CrawlScheduler(rate=100),
+                                                       writer=WriterPool(workers=2, max_pending=1))
+        return urls, failed
+
+    urls, failed = asyncio.run(crawl())
+
+    assert state["requests"] == {p: 1 for p in paths}
+    # Failure of one URL does not stop the others, and is returned
+    assert list(failed) == [urls[2]]
+    assert failed[urls[2]].status == 404
+    # Writes run on the writer pool, not the event loop
+    assert len(threads) == 2 and all(name.startswith("writer") for name in threads)
+    for league in ("EPL", "La_liga"):
+        written = {f.name for f in (tmp_path / "league" / league / "2020").iterdir() if f.is_file()}
+        assert written == {f"{var}.{parser.OUT_FORMAT}" for var in (parser.TEAM_MATCHES, *parser.JS_VARS)}
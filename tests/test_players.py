@@ -0,0 +1,67 @@
+import pytest
+from understat import analyse
+from understat.catalog import DataCatalog
+from understat.players import PlayerIndex
+from understat.schema import SCHEMAS
+from utils.storage import write_table
+
+PLAYERS = {
+    "2019": [
+        {"id": 1, "player_name": "Alpha", "team_title": "Arsenal", "goals": 3},
+        {"id": 2, "player_name": "Beta", "team_title": "Chelsea", "goals": 1},
+    ],
+    "2020": [
+        {"id": 1, "player_name": "Alpha", "team_title": "Arsenal,Chelsea", "goals": 5},
+        {"id": 3, "player_name": "Gamma", "team_title": "Chelsea", "goals": 0},
+    ],
+}
+
+
+def make_index(root):
+
+    for year, players in PLAYERS.items():
+        path = root / "EPL" / year
+        path.mkdir(parents=True)
+        write_table(players, str(path / "playersData.csv"))
+
+    return PlayerIndex(DataCatalog(str(root)), "playersData.csv", schema=SCHEMAS["playersData"])
+
+
+def test_team_players(tmp_path):
+
+    index = make_index(tmp_path)
+
+    assert index.team("Arsenal", "EPL", "2019")["player_name"].tolist() == ["Alpha"]
+    # Mid-season moves are listed under both teams
+    assert index.team("Chelsea", "EPL", "2020")["player_name"].tolist() == ["Alpha", "Gamma"]
+    assert index.team("Arsenal", "EPL", "2020")["player_name"].tolist() == ["Alpha"]
+    assert index.team("Liverpool", "EPL", "2020").empty
+    # Seasons are built once and reused
+    assert index.season("EPL", "2020") is index.season("EPL", "2020")
+
+
+def test_player_query(tmp_path):
+
+    index = make_index(tmp_path)
+
+    history = index.player(1)
+    assert history[["year", "goals"]].values.tolist() == [["2019", 3], ["2020", 5]]
+    assert index.player(1, years=range(2020, 2021))["year"].tolist() == ["2020"]
+
+    chelsea = index.query(teams=["Chelsea"], player_ids=[1, 2])
+    assert chelsea[["year", "player_name"]].values.tolist() == [["2019", "Beta"], ["2020", "Alpha"]]
+    assert index.query(leagues=["La_liga"]).empty
+
+
+def test_get_players_in_team(tmp_path, monkeypatch):
+
+    make_index(tmp_path)
+    (tmp_path / "La_liga" / "2021").mkdir(parents=True)
+    write_table(PLAYERS["2020"], str(tmp_path / "La_liga" / "2021" / "playersData.csv"))
+    monkeypatch.setattr(analyse, "CATALOG", DataCatalog(str(tmp_path)))
+
+    # League found from the players data of the requested year, not the most recent season of each league
+    assert [p["player_name"] for p in analyse.get_players_in_team("Chelsea", "2019")] == ["Beta"]
+    assert analyse.get_players_in_team("Arsenal", "2019", league="EPL")[0]["player_name"] == "Alpha"
+    with pytest.raises(ValueError, match="Liverpool"):
+        analyse.get_players_in_team("Liverpool", "2019")
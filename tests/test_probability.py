@@ -31,3 +31,80 @@ def test_combined_odds(r1, r2, actual):
 
     combined = probability.combined_odds(np.array([r1, r2]))
     np.testing.assert_almost_equal(combined, actual, decimal=1)
+
+
+# Two markets, two bookmakers, three outcomes. Only the first has an arbitrage at best prices (overround 0.9)
+MARKETS = np.array([
+    [[2.0, 3.0, 4.0], [1.0, 4.0, 3.0]],
+    [[1.0, 2.0, 2.0], [1.0, 2.0, np.nan]],
+])
+
+
+def test_best_prices():
+
+    prices, books = probability.best_prices(MARKETS)
+
+    np.testing.assert_array_equal(prices, [[2.0, 4.0, 4.0], [1.0, 2.0, 2.0]])
+    np.testing.assert_array_equal(books, [[0, 1, 0], [0, 0, 0]])
+
+
+def test_arbitrage():
+
+    result = probability.arbitrage(MARKETS, stake=[90, 100])
+
+    np.testing.assert_almost_equal(result["overround"], [1/3 + 1/5 + 1/5, 1/2 + 1/3 + 1/3])
+    np.testing.assert_array_equal(result["arbitrage"], [True, False])
+    # Every outcome returns the same, stakes in proportion to implied probability
+    np.testing.assert_almost_equal(result["stakes"][0], [90 * (1/3) / (11/15), 90 * (1/5) / (11/15),
+                                                         90 * (1/5) / (11/15)])
+    np.testing.assert_almost_equal(result["returns"], [90 / (11/15), 100 / (7/6)])
+    assert result["profit"][0] > 0 > result["profit"][1]
+
+
+def test_dutch_mask():
+
+    stakes, returns = probability.dutch(np.array([[1.0, 3.0, 9.0]]), stake=100, mask=np.array([[False, True, True]]))
+
+    np.testing.assert_almost_equal(stakes, [[0, 100 * 0.25 / 0.35, 100 * 0.1 / 0.35]])
+    np.testing.assert_almost_equal(returns, [100 / 0.35])
+
+
+@pytest.mark.parametrize(
+    "fmt, odds",
+    [
+        (probability.FRACTIONAL, [1.5, 0.5, 1.0]),
+        (probability.DECIMAL, [2.5, 1.5, 2.0]),
+        (probability.AMERICAN, [150, -200, 100]),
+        (probability.PROBABILITY, [0.4, 2/3, 0.5]),
+    ]
+)
+def test_convert_odds(fmt, odds):
+
+    np.testing.assert_almost_equal(probability.odds2probs(np.array(odds), fmt), [0.4, 2/3, 0.5])
+    np.testing.assert_almost_equal(probability.convert_odds(np.array([1.5, 0.5, 1.0]), probability.FRACTIONAL, fmt),
+                                   odds)
+
+
+# True probabilities of two markets, and bookmaker probabilities with a margin added by each method's own model
+TRUE = np.array([[0.5, 0.3, 0.2], [0.7, 0.2, 0.1]])
+SHIN_Z = 0.05
+ODDS_RATIO = 1.3
+
+
+@pytest.mark.parametrize(
+    "method, implied",
+    [
+        ("proportional", TRUE * 1.06),
+        ("power", TRUE ** 0.9),
+        ("shin", np.sqrt(SHIN_Z * TRUE + (1 - SHIN_Z) * TRUE ** 2) *
+         np.sqrt(SHIN_Z * TRUE + (1 - SHIN_Z) * TRUE ** 2).sum(axis=1, keepdims=True)),
+        ("odds_ratio", ODDS_RATIO * TRUE / (1 - TRUE + ODDS_RATIO * TRUE)),
+    ]
+)
+def test_remove_margin(method, implied):
+
+    probs = probability.remove_margin(implied, probability.PROBABILITY, method)
+    np.testing.assert_almost_equal(probs, TRUE)
+
+    implied = np.vstack([implied, [[0.5, np.nan, 0.6]]])
+    assert np.isnan(probability.remove_margin(implied, probability.PROBABILITY, method)[-1]).all()
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import shutil
+import asyncio
+import pathlib
+import subprocess
+from functools import partial
+from html.parser import HTMLParser
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sportsgambler import scraper
+from sportsgambler.browser import DriverPool
+from utils.crawl import CrawlScheduler
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "sportsgambler_lineups.html")
+
+
+def read_fixture() -> str:
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_lineups():
+
+    errors = []
+    h, a = scraper.parse_lineups(read_fixture(), errors)
+
+    # Third match has no lineups yet
+    assert [(x["team"], y["team"]) for x, y in zip(h, a)] == [("Liverpool", "Chelsea"),
+                                                             ("Brighton & Hove Albion", "Arsenal")]
+    assert errors == [{"row": 2, "teams": ["Everton", "Fulham"], "error": "no 'lineups-home' element"}]
+    assert [x["formation"] for x in h] == ["4-3-3", "4-2-3-1"]
+    assert a[0]["players"][-1] == ["Jackson"]
+    assert h[0]["players"][-1] == ["Salah", "Núñez", "Díaz"]
+    assert [sum(map(len, x["players"])) for x in h + a] == [11] * 4
+    assert a[0]["numbers"][-1] == [11]
+    assert h[0]["numbers"][:2] == [[1], [2, 3, 4, 5]]
+
+
+@pytest.mark.parametrize("mode", ["script", "source"])
+def test_strip(fake_driver, mode):
+
+    errors = []
+    pool = DriverPool(factory=lambda: fake_driver({"lineups": read_fixture()}))
+    with pool:
+        lineups = pool.scrape("lineups", partial(scraper.strip, mode=mode, errors=errors))
+
+    assert lineups == scraper.parse_lineups(read_fixture())
+    assert [e["row"] for e in errors] == [2]
+
+
+class TreeBuilder(HTMLParser):
+    """Builds the element tree of a page as json, for the minimal DOM in DOM_JS"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = {"cls": [], "children": []}
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = {"tag": tag, "cls": (dict(attrs).get("class") or "").split(), "children": []}
+        self._stack[-1]["children"].append(element)
+        if tag not in scraper.VOID_ELEMENTS:
+            self._stack.append(element)
+
+    def handle_endtag(self, tag):
+        if len(self._stack) > 1 and self._stack[-1]["tag"] == tag:
+            self._stack.pop()
+
+    def handle_data(self, data):
+        self._stack[-1]["children"].append({"text": data})
+
+
+# Just enough of the DOM for EXTRACT_JS, over a tree built by TreeBuilder
+DOM_JS = """
+const fs = require('fs');
+const wrap = n => {
+  if (n.text !== undefined) return {nodeValue: n.text, isText: true};
+  const el = {cls: n.cls, children: n.children.map(wrap)};
+  const walk = (e, visit) => e.children.forEach(c => { visit(c); if (!c.isText) walk(c, visit); });
+  el.getElementsByClassName = cls => {
+    const out = [];
+    walk(el, c => !c.isText && c.cls.includes(cls) && out.push(c));
+    return out;
+  };
+  el.texts = () => { const out = []; walk(el, c => c.isText && out.push(c)); return out; };
+  Object.defineProperty(el, 'textContent', {get: () => el.texts().map(c => c.nodeValue).join('')});
+  return el;
+};
+const document = wrap(JSON.parse(fs.readFileSync(process.argv[2], 'utf8')));
+document.createTreeWalker = root => {
+  const nodes = root.texts();
+  let i = -1;
+  return {nextNode: () => ++i < nodes.length, get currentNode() { return nodes[i]; }};
+};
+const extract = new Function('document', 'NodeFilter', fs.readFileSync(process.argv[3], 'utf8'));
+console.log(JSON.stringify(extract(document, {SHOW_TEXT: 4})));
+"""
+
+
+def test_extract_js_layout():
+
+    parser = scraper.LineupParser()
+    parser.feed(read_fixture())
+    # Keys of the object returned per row by EXTRACT_JS
+    keys = re.findall(r"(\w+):", scraper.EXTRACT_JS.rsplit("return", 1)[1])
+
+    assert keys == list(parser.rows[0])
+
+
+def test_extract_js_node(tmp_path):
+
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not available")
+
+    builder = TreeBuilder()
+    builder.feed(read_fixture())
+    (tmp_path / "tree.json").write_text(json.dumps(builder.root), encoding="utf-8")
+    (tmp_path / "dom.js").write_text(DOM_JS, encoding="utf-8")
+    (tmp_path / "extract.js").write_text(scraper.EXTRACT_JS, encoding="utf-8")
+    paths = [str(tmp_path / name) for name in ("dom.js", "tree.json", "extract.js")]
+    result = subprocess.run([node, *paths], capture_output=True, text=True, encoding="utf-8", check=True)
+    rows = json.loads(result.stdout)
+
+    parser = scraper.LineupParser()
+    parser.feed(read_fixture())
+    assert rows == parser.rows
+
+    script_errors, source_errors = [], []
+    assert scraper.lineups_from_rows(rows, script_errors) == scraper.parse_lineups(read_fixture(), source_errors)
+    assert script_errors == source_errors == [{"row": 2, "teams": ["Everton", "Fulham"],
+                                               "error": "no 'lineups-home' element"}]
+
+
+def test_extract_js_browser():
+
+    pytest.importorskip("selenium")
+    from sportsgambler.browser import chrome_driver
+    try:
+        driver = chrome_driver()
+    except Exception as e:
+        pytest.skip(f"No browser available ({e!r})")
+
+    try:
+        driver.get(pathlib.Path(FIXTURE).as_uri())
+        script_errors, source_errors = [], []
+        assert scraper.strip(driver, "script", script_errors) == scraper.parse_lineups(read_fixture(), source_errors)
+        assert script_errors == source_errors
+    finally:
+        driver.quit()
+
+
+@pytest.mark.parametrize(
+    "row, error",
+    [
+        ({"teams": ["A"], "formations": [], "players": [None, None]}, "expected 2 teams, found 1"),
+        ({"teams": ["A", "B"], "formations": ["4-4-2"], "players": [[["x"]], None]}, "no 'lineups-away' element"),
+        ({"teams": ["A", "B"], "formations": ["4-4-2"], "players": [[["x"]], [[]]]}, "no players in 'lineups-away'"),
+        ({"teams": ["A", "B"], "formations": ["4-4-2"], "players": [[["x"]], [["y"]]]},
+         "expected 2 formations, found 1"),
+    ]
+)
+def test_row_error(row, error):
+
+    assert scraper.row_error(row) == error
+
+
+def test_fetch_lineups():
+
+    async def lineups(request):
+        if request.match_info["league"] == "missing":
+            return web.Response(status=404)
+        return web.Response(text=read_fixture(), content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{league}/", lineups)
+        async with TestServer(app) as server:
+            scraper_url = str(server.make_url("")).rstrip("/")
+            return await scraper.fetch_lineups(["premier/", "ligue-1/", "missing/"], base_url=scraper_url,
+                                               scheduler=CrawlScheduler(rate=100, retries=0))
+
+    results = asyncio.run(run())
+
+    assert list(results) == ["premier/", "ligue-1/"]
+    assert results["premier/"] == scraper.parse_lineups(read_fixture())
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+import pytest
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from utils import storage
+
+
+ROWS = [
+    {"id": "1", "title": "Arsenal", "xG": "1.25", "h_a": "h"},
+    {"id": "2", "title": "Chelsea", "xG": "0.5", "h_a": "a"},
+]
+
+
+@pytest.mark.parametrize("fmt", storage.FORMATS)
+def test_write_read_table(tmp_path, fmt):
+
+    file_path = str(tmp_path / f"data.{fmt}")
+    storage.write_table(ROWS, file_path)
+    df = storage.read_table(file_path)
+
+    assert df["title"].tolist() == ["Arsenal", "Chelsea"]
+    assert pd.api.types.is_integer_dtype(df["id"])
+    assert pd.api.types.is_float_dtype(df["xG"])
+
+
+@pytest.mark.parametrize("fmt", storage.FORMATS)
+def test_read_table_columns(tmp_path, fmt):
+
+    file_path = str(tmp_path / f"data.{fmt}")
+    storage.write_table(ROWS, file_path)
+    df = storage.read_table(file_path, columns=["title", "xG"])
+
+    assert list(df.columns) == ["title", "xG"]
+
+
+@pytest.mark.parametrize("fmt", storage.FORMATS)
+def test_write_table_stream(tmp_path, monkeypatch, fmt):
+
+    monkeypatch.setattr(storage, "CHUNK_SIZE", 2)
+    file_path = str(tmp_path / f"data.{fmt}")
+    rows = ({"id": i, "xG": i / 2} for i in range(5))
+    storage.write_table(rows, file_path)
+
+    df = storage.read_table(file_path)
+    assert df["id"].tolist() == list(range(5))
+    assert df["xG"].tolist() == [i / 2 for i in range(5)]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+@pytest.mark.parametrize("goals", [["1", "2", "3", None, "5"], [None, "2", "3", "4", "5"]])
+def test_write_table_stream_schema(tmp_path, monkeypatch, fmt, goals):
+
+    monkeypatch.setattr(storage, "CHUNK_SIZE", 2)
+    file_path = str(tmp_path / f"data.{fmt}")
+    rows = ({"goals": g, "title": None if i < 2 else "Arsenal"} for i, g in enumerate(goals))
+    storage.write_table(rows, file_path, schema={"goals": storage.INT, "title": storage.STR})
+
+    # Integer column holds nulls whichever chunk the missing values are in
+    table = pq.read_table(file_path) if fmt == "parquet" else feather.read_table(file_path)
+    assert str(table.schema.field("goals").type) == "int64"
+    assert table.column("goals").to_pylist() == [None if g is None else int(g) for g in goals]
+    assert table.column("title").to_pylist() == [None, None, "Arsenal", "Arsenal", "Arsenal"]
+
+
+def test_dict2csv_schema_append(tmp_path):
+
+    file_path = str(tmp_path / "data.csv")
+    storage.write_table(iter(ROWS), file_path, fieldnames=["id", "title"])
+    storage.write_table([{"title": "Everton", "id": "3", "xG": "1.0"}], file_path, append=True)
+
+    df = storage.read_table(file_path)
+    assert list(df.columns) == ["id", "title"]
+    assert df["title"].tolist() == ["Arsenal", "Chelsea", "Everton"]
+
+
+def test_invalid_format():
+
+    with pytest.raises(ValueError):
+        storage.get_format("data.txt")
+
+
+def test_writer_pool_backpressure():
+
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def write(i):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return i
+
+    async def run():
+        async with storage.WriterPool(workers=4, max_pending=2) as writer:
+            futures = [await writer.submit(write, i) for i in range(6)]
+        return [f.result() for f in futures]
+
+    assert asyncio.run(run()) == list(range(6))
+    assert state["peak"] == 2
+
+
+def test_apply_schema():
+
+    df = pd.DataFrame({"id": [1, 2], "goals": ["1", None], "xG": ["0.5", "1"], "isResult": ["True", "False"],
+                       "date": ["2020-09-12 15:00:00", "2020-09-19 15:00:00"], "other": ["a", "b"]})
+    schema = {"id": storage.STR, "goals": storage.INT, "xG": storage.FLOAT, "isResult": storage.BOOL,
+              "date": storage.DATETIME}
+    df = storage.apply_schema(df, schema)
+
+    assert df["id"].tolist() == ["1", "2"]
+    assert pd.api.types.is_float_dtype(df["goals"])
+    assert df["xG"].tolist() == [0.5, 1.0]
+    assert df["isResult"].tolist() == [True, False]
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+    assert df["other"].tolist() == ["a", "b"]
+
+
+def test_apply_schema_invalid():
+
+    with pytest.raises(ValueError, match="xG"):
+        storage.apply_schema(pd.DataFrame({"xG": ["0.5", "n/a"]}), {"xG": storage.FLOAT})
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+from understat.players import SeasonPlayers
+from understat.strength import LineupStrength, UNRESOLVED
+
+PLAYERS = pd.DataFrame({
+    "id": [1, 2, 3, 5, 6, 7, 8],
+    "player_name": ["Mohamed Salah", "Virgil van Dijk", "Darwin Núñez", "Cole Palmer", "Kai Havertz", "Bukayo Saka",
+                    "Pascal Groß"],
+    "team_title": ["Liverpool", "Liverpool", "Liverpool", "Chelsea", "Chelsea,Arsenal", "Arsenal", "Brighton"],
+    "time": [900, 900, 180, 450, 900, 900, 720],
+    "xG": [5., 1., 2., 3., 4., 3., 1.],
+    "xA": [2., 0., 0., 1., 1., 3., 2.],
+    "xGChain": [8., 3., 2., 5., 6., 9., 4.],
+})
+
+
+@pytest.fixture
+def engine():
+    return LineupStrength(SeasonPlayers(PLAYERS, "EPL", "2023"))
+
+
+def test_rates(engine):
+
+    # Per 90 minutes, over at least MIN_MINUTES
+    assert engine.rates[1].tolist() == [0.5, 0.2, 0.8]
+    assert engine.rates[3].tolist() == [2 / 3, 0., 2 / 3]
+    # Missing ids and unresolved players have zero rates
+    assert not engine.rates[4].any()
+    assert not engine.rates[UNRESOLVED].any()
+
+
+@pytest.mark.parametrize("team, players, expected_team, expected_ids", [
+    ("Liverpool", ["M. Salah", "Van Dijk", "Darwin Nunez"], "Liverpool", [1, 2, 3]),
+    ("Brighton & Hove Albion", ["Pascal Gross"], "Brighton", [8]),
+    # Havertz played for both teams, unknown players are left unresolved
+    ("Arsenal", ["Havertz", "Xyzzy Qwerty"], "Arsenal", [6, UNRESOLVED]),
+    # Teams not in the season are left unresolved, rather than matched to the closest
+    ("Paris Saint Germain", ["Salah", "Palmer"], None, [UNRESOLVED, UNRESOLVED]),
+    ("Lille", ["Salah"], None, [UNRESOLVED]),
+    (None, ["Salah"], None, [UNRESOLVED]),
+])
+def test_resolve(engine, team, players, expected_team, expected_ids):
+
+    team, ids = engine.resolve(team, players)
+    assert team == expected_team
+    assert ids.tolist() == expected_ids
+
+
+def test_strength(engine):
+
+    ids = np.array([[1, 2, UNRESOLVED], [5, 6, 6]])
+    expected = [engine.rates[[1, 2]].sum(axis=0), engine.rates[[5, 6, 6]].sum(axis=0)]
+    np.testing.assert_allclose(engine.strength(ids), expected)
+
+
+def test_fixtures(engine):
+
+    home = [{"team": "Liverpool", "players": [["Van Dijk"], ["Salah"]]}]
+    away = [{"team": "Chelsea", "players": [["Palmer"], ["Someone Else"]]}]
+    fixtures = engine.fixtures(home, away)
+
+    assert fixtures.loc[0, "h_team"] == "Liverpool"
+    assert fixtures.loc[0, "a_team"] == "Chelsea"
+    assert fixtures.loc[0, "h_resolved"] == 2
+    assert fixtures.loc[0, "a_resolved"] == 1
+    assert fixtures.loc[0, "h_xG"] == pytest.approx(0.6)
+    # Baseline is the team's most played XI, including Núñez for Liverpool and Havertz for Chelsea
+    assert fixtures.loc[0, "h_xG_adj"] == pytest.approx(-2 / 3)
+    assert fixtures.loc[0, "a_xG_adj"] == pytest.approx(-0.4)
+
+
+def test_fixtures_unknown_team(engine):
+
+    home = [{"team": "Liverpool", "players": ["Salah"]}, {"team": "Lille", "players": ["Salah"]}]
+    away = [{"team": "Chelsea", "players": ["Palmer"]}, {"team": "Chelsea", "players": ["Palmer"]}]
+    fixtures = engine.fixtures(home, away)
+
+    assert fixtures["h_team"].isna().tolist() == [False, True]
+    assert fixtures.loc[1, ["h_xG", "h_xG_adj"]].isna().all()
+    assert fixtures.loc[1, "h_resolved"] == 0
+    assert fixtures.loc[1, "a_xG"] == fixtures.loc[0, "a_xG"]
+
+
+def test_save_aliases(tmp_path):
+
+    path = str(tmp_path / "aliases.json")
+    engine = LineupStrength(SeasonPlayers(PLAYERS, "EPL", "2023"), aliases_path=path)
+    _, ids = engine.resolve("Arsenal", ["B. Saka", "A. Saka"])
+    engine.resolve("Chelsea", ["Cole Palmar"])
+    engine.save_aliases()
+
+    # Initials contradicting the first name are matched by ratio, only confident matches are remembered
+    assert ids.tolist() == [7, 7]
+    aliases = LineupStrength(SeasonPlayers(PLAYERS, "EPL", "2023"), aliases_path=path).team_matcher.aliases
+    assert aliases == {"B. Saka": "Bukayo Saka"}
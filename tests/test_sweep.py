@@ -0,0 +1,49 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from understat.sweep import run_sweep
+
+TEAMS = ["A", "B", "C", "D"]
+STATS = ["xG", "xGA", "deep"]
+
+
+def make_season(seed):
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for r, (home, away) in enumerate(itertools.permutations(TEAMS, 2)):
+        date = pd.Timestamp("2020-09-01") + pd.Timedelta(days=r)
+        for team, opp, h_a in ((home, away, "h"), (away, home, "a")):
+            rows.append({"team": team, "opp": opp, "match_id": str(r), "date": date, "h_a": h_a,
+                         **dict(zip(STATS, rng.random(len(STATS))))})
+
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_sweep(workers):
+
+    from sklearn.linear_model import LinearRegression
+
+    seasons = {("EPL", "2019"): make_season(0), ("EPL", "2020"): make_season(1)}
+    results = run_sweep(seasons, ns=(1, 2), features={"all": STATS, "xg": ["xG"]},
+                        models={"linear": LinearRegression()}, cv=3, workers=workers)
+
+    assert len(results) == 2 * 2 * 2
+    assert results[["year", "n", "features"]].drop_duplicates().shape[0] == 8
+    assert (results["rmse"] > 0).all()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_sweep_failed_season(workers, capsys):
+
+    from sklearn.linear_model import LinearRegression
+
+    # A season missing a swept stat fails, the others are still evaluated
+    seasons = {("EPL", "2019"): make_season(0).drop(columns="deep"), ("EPL", "2020"): make_season(1)}
+    results = run_sweep(seasons, ns=(1,), features={"all": STATS}, models={"linear": LinearRegression()}, cv=3,
+                        workers=workers)
+
+    assert results["year"].tolist() == ["2020"]
+    assert "Sweep failed for league: EPL, year: 2019, n: 1" in capsys.readouterr().out
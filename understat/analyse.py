@@ -1,16 +1,32 @@
-import os
 import pathlib
 from typing import List
-from utils.gen import get_path, get_dirs, get_csv_data, str2num, csv2pd
+import pandas as pd
+from utils.gen import get_path
+from utils.storage import read_table
+from understat.catalog import DataCatalog
+from understat.players import PlayerIndex
+from understat.schema import SCHEMAS
 
 HERE = str(pathlib.Path(__file__).parent)
-LEAGUES = get_dirs(HERE)
+CATALOG = DataCatalog(HERE)
 TEAM_HISTORY = 'team_data'
+TEAM_MATCHES = 'team_matches'
 TEAMS_DATA = 'teamsData'
 PLAYERS_DATA = 'playersData'
 GAMES_DATA = 'datesData'
-FORMAT = 'csv'
+FORMAT = 'csv'  # One of utils.storage.FORMATS, must match parser.OUT_FORMAT
 LOCATIONS = ('home', 'away')
+MATCH_COLUMNS = ['id', 'datetime', 'h_id', 'h_title', 'a_id', 'a_title', 'goals_h', 'goals_a', 'xG_h', 'xG_a']
+
+_player_index = None
+
+
+def __getattr__(name):
+    # Leagues are discovered on first use through the catalog, rather than by scanning the data tree on import
+    if name == 'LEAGUES':
+        return CATALOG.leagues()
+
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 def get_league_path(league: str, year: str = None, teams: List[str] = None):
@@ -21,7 +37,7 @@ def get_league_path(league: str, year: str = None, teams: List[str] = None):
     :return: absolute paths to required directories
     """
 
-    path_segments = [HERE, league]
+    path_segments = [CATALOG.root, league]
 
     if year:
         path_segments.append(year)
@@ -40,9 +56,8 @@ def get_league_years(league: str):
     :returns years: years in database
              paths: paths to data for each year
     """
-    league_path = get_path(HERE, league)
-    years = get_dirs(league_path)
-    paths = [get_path(league_path, year) for year in years]
+    years = CATALOG.seasons(league)
+    paths = [CATALOG.season_path(league, year) for year in years]
     return years, paths
 
 
@@ -56,7 +71,7 @@ def get_most_recent_year(league: str):
     years, _ = get_league_years(league)
     # Convert to integer, find maximum, return to string
     year = str(max(map(int, years)))
-    path = get_path(HERE, league, year)
+    path = CATALOG.season_path(league, year)
     return year, path
 
 
@@ -66,13 +81,11 @@ def get_teams_in_league(league: str = 'EPL', year: str = None):
     :param year: string of requested year, default = most recent
     :return: all teams in league year
     """
-    if league not in LEAGUES:
-        raise ValueError(f"Invalid league. Expected one of: {LEAGUES}")
+    leagues = CATALOG.leagues()
+    if league not in leagues:
+        raise ValueError(f"Invalid league. Expected one of: {leagues}")
 
-    league_dir = get_path(HERE, league)
-    years = get_dirs(league_dir)
-
-    if year not in years:
+    if year is None or str(year) not in CATALOG.seasons(league):
         # Getting most recent year as default
         recent_year, _ = get_most_recent_year(league)
 
@@ -83,10 +96,10 @@ def get_teams_in_league(league: str = 'EPL', year: str = None):
 
         year = recent_year
 
-    teams_file = get_path(league_dir, year, f"{TEAMS_DATA}.{FORMAT}")
-    teams_data = get_csv_data(teams_file)
+    all_teams = CATALOG.teams(league, year, f"{TEAMS_DATA}.{FORMAT}")
+    if all_teams is None:
+        raise ValueError(f"No {TEAMS_DATA} found for league: {league}, year: {year}")
 
-    all_teams = [t['title'] for t in teams_data]
     return all_teams
 
 
@@ -97,42 +110,66 @@ def find_team_league(team: str, year: str, fatal=False):
     :param fatal: boolean defining whether team not found gives warning (default), or error
     :return: league in which team was found, or None if team not found
     """
-    for league in LEAGUES:
+    leagues = CATALOG.leagues()
+    for league in leagues:
         teams = get_teams_in_league(league, year)
         if team in teams:
             # Team found, return league
             return league
-        elif league == LEAGUES[-1]:
 
-            string = f"Team '{team}' could not be found in any league: {LEAGUES}"
-            if fatal:
-                raise ValueError(string)
-            else:
-                print(string)
-            return None
+    string = f"Team '{team}' could not be found in any league: {leagues}"
+    if fatal:
+        raise ValueError(string)
+    else:
+        print(string)
+    return None
 
 
 def get_players_in_team(team: str, year: str, league: str = None):
     """Get all players in given team, find team if league not specified
     :param team: team name string
-    :param league: league team is in, default = search leagues for team
-    :param year: year string or integer, default = most recent
+    :param league: league team is in, default = search leagues' players data of the year for team
+    :param year: year string or integer
     :return: list of players in team
     """
-    # If no league specified, loop through available to find team
+    index = get_player_index()
     if league is None:
-        league = find_team_league(team, year, fatal=True)
+        # Searched within the indexed seasons of this year, rather than reading every league's teams file
+        seasons = [season for season in index.seasons(years=[year]) if team in season.by_team]
+        if not seasons:
+            raise ValueError(f"Team '{team}' could not be found in any league in year: {year}")
+        league = seasons[0].league
 
-    path = get_league_path(league, year)
-    # TODO: Not working with pandas (csv2pd), potentially loaned player issue?
-    data = get_csv_data(get_path(path, f"{PLAYERS_DATA}.{FORMAT}"))
-    # Filtering players, then converting strings to numbers
-    players = [row for row in data if team == row['team_title']]
-    players = str2num(players)
+    # Includes players who moved mid-season, listed under both teams
+    players = index.team(team, league, year).to_dict('records')
 
     return players
 
 
+def get_player_index() -> PlayerIndex:
+    """Get index of player stats across leagues and seasons, shared between calls
+    Seasons are indexed on first query and reused until their players data file changes
+    :return: player index over CATALOG in the current FORMAT
+    """
+    global _player_index
+    filename = f"{PLAYERS_DATA}.{FORMAT}"
+
+    if _player_index is None or _player_index.catalog is not CATALOG or _player_index.filename != filename:
+        _player_index = PlayerIndex(CATALOG, filename, schema=SCHEMAS[PLAYERS_DATA])
+
+    return _player_index
+
+
+def get_player_history(player_id: str, leagues: List[str] = None, years: List[str] = None) -> pd.DataFrame:
+    """Get season stats of a player across leagues and seasons
+    :param player_id: understat player id
+    :param leagues: leagues to search, default = all
+    :param years: years to search (e.g. range(2018, 2021)), default = all
+    :return: data frame with one row per player season, with 'league' and 'year' columns
+    """
+    return get_player_index().player(player_id, leagues=leagues, years=years)
+
+
 def is_team_in_league(league: str, team: List[str], year: str = None):
     """Check requested team is within requested league
     :param league: league directory string
@@ -160,32 +197,19 @@ def get_team_history(league, year, n: int = 0, teams: List[str] = None, location
     :param teams: team or list of teams requested (assumed pre-checked)
     :param location: option to only take 'home' or 'away' games
     """
-    path = check_league_year(league, year)
+    if not check_league_year(league, year):
+        raise ValueError(f"No data found for league: {league}, year: {year}")
 
     if not teams:
-        teams = get_teams_in_league(league)
+        teams = get_teams_in_league(league, year)
 
     if location and location not in LOCATIONS:
         raise ValueError(f"Invalid league. Expected one of: {LOCATIONS}")
 
-    matches = csv2pd(get_path(path, f"{GAMES_DATA}.{FORMAT}"))
+    all_games = split_team_matches(get_team_matches(league, year, teams), teams)
 
     history = []
-    for t in teams:
-        team_path = os.path.join(path, t.replace(" ", "_"))
-        games = csv2pd(os.path.join(team_path, f"{TEAM_HISTORY}.{FORMAT}"))
-
-        # TODO: Hacky way to attach opponent name to data, should be processed this way from start
-        team_matches = matches.loc[(matches["h_title"] == t) | (matches["a_title"] == t)]
-        opp = []
-        for i in range(0, len(games)):
-
-            if games.iloc[i]["h_a"] == 'h':
-                opp.append(team_matches.iloc[i]["a_title"])
-            else:
-                opp.append(team_matches.iloc[i]["h_title"])
-
-        games["opp"] = opp
+    for games in all_games:
 
         if location:
             games = games.loc[games['h_a'] == location[0]]
@@ -198,6 +222,123 @@ def get_team_history(league, year, n: int = 0, teams: List[str] = None, location
     return history
 
 
+def get_team_matches(league: str, year: str, teams: List[str] = None) -> pd.DataFrame:
+    """Get consolidated game histories of a season, with one row per team per game
+    :param league: league directory string
+    :param year: year directory string or integer
+    :param teams: list of teams required from per-team files, default = all teams in league
+    :return: long-format data frame in TEAM_MATCHES layout
+    """
+    matches_file = CATALOG.file_path(league, year, f"{TEAM_MATCHES}.{FORMAT}")
+    if matches_file is not None:
+        return read_table(matches_file, schema=SCHEMAS[TEAM_MATCHES])
+
+    # Older crawls only have per-team history files
+    return read_team_files(league, year, teams or get_teams_in_league(league, year))
+
+
+def get_team_matches_files(league: str, year: str, teams: List[str] = None) -> List[str]:
+    """Get paths of the data files get_team_matches reads for a season
+    :param league: league directory string
+    :param year: year directory string or integer
+    :param teams: list of teams required from per-team files, default = all teams in league
+    :return: list of absolute file paths
+    """
+    matches_file = CATALOG.file_path(league, year, f"{TEAM_MATCHES}.{FORMAT}")
+    if matches_file is not None:
+        return [matches_file]
+
+    files = [CATALOG.file_path(league, year, f"{GAMES_DATA}.{FORMAT}")]
+    for t in teams or get_teams_in_league(league, year):
+        files.append(CATALOG.team_path(league, year, t, f"{TEAM_HISTORY}.{FORMAT}"))
+
+    return [f for f in files if f is not None]
+
+
+def split_team_matches(team_matches: pd.DataFrame, teams: List[str]) -> List[pd.DataFrame]:
+    """Split consolidated team-match table into per-team game histories
+    :param team_matches: long-format table with one row per team per game
+    :param teams: list of teams requested
+    :return: list of data frames, one per requested team
+    """
+    groups = dict(tuple(team_matches.groupby('team', sort=False)))
+
+    history = []
+    for t in teams:
+        if t not in groups:
+            raise ValueError(f"Team '{t}' not found in team-match table")
+
+        games = groups[t].drop(columns=['team', 'team_id']).reset_index(drop=True)
+        history.append(games)
+
+    return history
+
+
+def read_team_files(league: str, year: str, teams: List[str]) -> pd.DataFrame:
+    """Read per-team game histories from individual team directories, attaching match details from datesData
+    :param league: league directory string
+    :param year: year directory string or integer
+    :param teams: list of teams requested
+    :return: long-format data frame with one row per team per game
+    """
+    matches = read_table(CATALOG.file_path(league, year, f"{GAMES_DATA}.{FORMAT}"), columns=MATCH_COLUMNS,
+                         schema=SCHEMAS[GAMES_DATA])
+
+    all_games = []
+    for t in teams:
+        team_file = CATALOG.team_path(league, year, t, f"{TEAM_HISTORY}.{FORMAT}")
+        if team_file is None:
+            raise ValueError(f"No {TEAM_HISTORY} found for team: {t}")
+
+        games = read_table(team_file, schema=SCHEMAS[TEAM_HISTORY])
+        games.insert(0, 'team', t)
+        all_games.append(games)
+
+    return attach_matches(pd.concat(all_games, ignore_index=True), matches)
+
+
+def attach_matches(games: pd.DataFrame, matches: pd.DataFrame) -> pd.DataFrame:
+    """Join team game histories to datesData on team, date and location
+    :param games: game histories with 'team', 'date' and 'h_a' columns
+    :param matches: datesData containing at least MATCH_COLUMNS
+    :return: game histories with opponent, match id and goals/xG for and against attached
+    """
+    fixtures = get_fixtures(matches)
+    # Raises if a game matches more than one fixture
+    merged = games.merge(fixtures, how='left', on=['team', 'date', 'h_a'], validate='one_to_one', indicator=True)
+
+    missing = merged['_merge'] == 'left_only'
+    if missing.any():
+        unmatched = merged.loc[missing, ['team', 'date', 'h_a']].to_dict('records')
+        raise ValueError(f"{len(unmatched)} games not found in {GAMES_DATA}: {unmatched[:5]}")
+
+    return merged.drop(columns='_merge')
+
+
+def get_fixtures(matches: pd.DataFrame) -> pd.DataFrame:
+    """Convert datesData to long format, with one row per team per match from that team's perspective
+    :param matches: datesData containing at least MATCH_COLUMNS
+    :return: data frame of fixtures keyed by team, date and h_a
+    """
+    sides = []
+    for side, other in (('h', 'a'), ('a', 'h')):
+        sides.append(pd.DataFrame({
+            'team': matches[f'{side}_title'],
+            'team_id': matches[f'{side}_id'],
+            'date': matches['datetime'],
+            'h_a': side,
+            'opp': matches[f'{other}_title'],
+            'opp_id': matches[f'{other}_id'],
+            'match_id': matches['id'],
+            'goals_for': matches[f'goals_{side}'],
+            'goals_against': matches[f'goals_{other}'],
+            'xG_for': matches[f'xG_{side}'],
+            'xG_against': matches[f'xG_{other}'],
+        }))
+
+    return pd.concat(sides, ignore_index=True)
+
+
 def check_league_year(league: str, year: str):
     """Check league/year path, return if exists
     :param league: league directory string
@@ -207,7 +348,7 @@ def check_league_year(league: str, year: str):
     year_bool = year_exists(league, year)
 
     if league_bool and year_bool:
-        return get_path(HERE, league, year)
+        return CATALOG.season_path(league, year)
 
 
 def league_exists(league):
@@ -215,7 +356,7 @@ def league_exists(league):
     :param league: league directory string
     :returns: boolean, true if league directory found
     """
-    exists = os.path.exists(get_path(HERE, league))
+    exists = CATALOG.league_path(league) is not None
     if not exists:
         print(f"League: {league} not found")
 
@@ -227,7 +368,7 @@ def year_exists(league: str, year: str):
     :param league: league directory string
     :param year: year directory string or integer
     """
-    exists = os.path.exists(get_path(HERE, league, year))
+    exists = CATALOG.season_path(league, year) is not None
 
     if not exists:
         print(f"Year: {year} not found in league: {league}")
@@ -0,0 +1,115 @@
+import os
+from typing import Callable, List, Optional
+from utils.gen import get_path, get_dirs
+from utils.storage import read_table
+
+
+class DataCatalog:
+    """In-process index of the understat data tree: league -> season -> teams -> file paths
+
+    Directory listings and team lists are read once, then reused until the modification time (or size) of the
+    underlying directory or file changes, so repeated lookups cost a single stat call.
+    """
+
+    def __init__(self, root: str):
+        """
+        :param root: directory containing league directories
+        """
+        self.root = root
+        self._cache = {}
+
+    def cached(self, path: str, load: Callable):
+        """Get value loaded from path, reloading only if path has changed since it was last loaded
+        :param path: directory or file path
+        :param load: function taking path and returning value to be cached
+        :return: cached value, or None if path does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._cache.pop(path, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = self._cache.get(path)
+        if entry is None or entry[0] != signature:
+            entry = (signature, load(path))
+            self._cache[path] = entry
+
+        return entry[1]
+
+    def invalidate(self) -> None:
+        """Drop all cached entries, forcing a rescan on next lookup"""
+        self._cache.clear()
+
+    def leagues(self) -> List[str]:
+        """Get leagues in data tree
+        :return: list of league directory names
+        """
+        return list(self.cached(self.root, get_dirs) or [])
+
+    def seasons(self, league: str) -> List[str]:
+        """Get seasons in data tree for a given league
+        :param league: league directory name
+        :return: list of year directory names, empty if league not found
+        """
+        return list(self.cached(get_path(self.root, league), get_dirs) or [])
+
+    def league_path(self, league: str) -> Optional[str]:
+        """Get path to league directory
+        :param league: league directory name
+        :return: absolute path, or None if league not found
+        """
+        return get_path(self.root, league) if league in self.leagues() else None
+
+    def season_path(self, league: str, year: str) -> Optional[str]:
+        """Get path to season directory
+        :param league: league directory name
+        :param year: year directory name
+        :return: absolute path, or None if season not found
+        """
+        return get_path(self.root, league, str(year)) if str(year) in self.seasons(league) else None
+
+    def _season_files(self, league: str, year: str) -> set:
+        """Get names of all entries (files and team directories) in a season directory"""
+        return self.cached(get_path(self.root, league, str(year)), lambda p: set(os.listdir(p))) or set()
+
+    def file_path(self, league: str, year: str, filename: str) -> Optional[str]:
+        """Get path to league-wide data file for a given season
+        :param league: league directory name
+        :param year: year directory name
+        :param filename: data file name, including extension
+        :return: absolute path, or None if file not found
+        """
+        if filename in self._season_files(league, year):
+            return get_path(self.root, league, str(year), filename)
+
+        return None
+
+    def team_path(self, league: str, year: str, team: str, filename: str) -> Optional[str]:
+        """Get path to data file within a team directory for a given season
+        :param league: league directory name
+        :param year: year directory name
+        :param team: team name, as found in teams data
+        :param filename: data file name, including extension
+        :return: absolute path, or None if team directory not found
+        """
+        team_dir = team.replace(" ", "_")
+        if team_dir in self._season_files(league, year):
+            return get_path(self.root, league, str(year), team_dir, filename)
+
+        return None
+
+    def teams(self, league: str, year: str, filename: str) -> Optional[List[str]]:
+        """Get teams in a given season, read from the teams data file
+        :param league: league directory name
+        :param year: year directory name
+        :param filename: teams data file name, including extension
+        :return: list of team names, or None if teams file not found
+        """
+        path = self.file_path(league, year, filename)
+        if path is None:
+            return None
+
+        teams = self.cached(path, lambda p: read_table(p, columns=['title'])['title'].tolist())
+        return list(teams) if teams is not None else None
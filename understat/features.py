@@ -0,0 +1,78 @@
+"""Rolling-form features for match models, built from a season's consolidated team-match table
+(see analyse.get_team_matches), one row per team per game.
+"""
+from typing import Iterable, Tuple
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from understat.analyse import LOCATIONS
+from understat.schema import HISTORY_STATS
+
+# Per-game stats averaged over previous games. Non-penalty stats are left out as they largely duplicate their totals,
+# and the match columns (goals_for/against, xG_for/against) as they equal scored/missed and xG/xGA exactly
+STATS = tuple(s for s in HISTORY_STATS if not s.startswith('npx'))
+TARGET = 'xG'
+OPP_PREFIX = 'opp_'
+
+
+def rolling_form(matches: pd.DataFrame, n: int, stats: Iterable[str] = STATS) -> pd.DataFrame:
+    """Mean of each stat over each team's previous n games, i.e. its form going into each game
+    :param matches: team-match table with 'team', 'match_id', 'date' and stats columns
+    :param n: number of previous games to average over
+    :param stats: stat columns to average
+    :return: data frame of 'team', 'match_id' and averaged stats, NaN until a team has played n games
+    """
+    stats = list(stats)
+    matches = matches.sort_values(['team', 'date'], kind='stable')
+
+    values = matches[stats].to_numpy(dtype=float)
+    position = matches.groupby('team', sort=False).cumcount().to_numpy()
+
+    form = np.full(values.shape, np.nan)
+    if len(values) > n:
+        # Window i covers rows i to i + n - 1, giving the form going into row i + n
+        means = sliding_window_view(values, n, axis=0).mean(axis=-1)
+        form[n:] = means[:-1]
+        # Windows running back into the previous team's games
+        form[position < n] = np.nan
+
+    form = pd.DataFrame(form, columns=stats, index=matches.index)
+    form.insert(0, 'team', matches['team'])
+    form.insert(1, 'match_id', matches['match_id'])
+    return form
+
+
+def build_features(matches: pd.DataFrame, n: int, stats: Iterable[str] = STATS, target: str = TARGET,
+                   location: str = None) -> Tuple[pd.DataFrame, pd.Series]:
+    """Build design matrix of team and opponent form going into each game, against a stat of that game
+    :param matches: team-match table with 'team', 'opp', 'match_id', 'date', 'h_a', target and stats columns
+    :param n: number of previous games to average over
+    :param stats: stat columns to average
+    :param target: stat to predict
+    :param location: option to only take 'home' or 'away' games, form is then taken over the team's previous games at
+        that location and the opponent's previous games at the other
+    :return: features (stats, then stats of opponent prefixed with OPP_PREFIX) and target, indexed by team and match
+        id, games without n previous games for both sides are dropped
+    """
+    stats = list(stats)
+    matches = matches.reset_index(drop=True)
+
+    if location:
+        if location not in LOCATIONS:
+            raise ValueError(f"Invalid location. Expected one of: {LOCATIONS}")
+
+        opp_location = LOCATIONS[1 - LOCATIONS.index(location)]
+        games = matches.loc[matches['h_a'] == location[0]]
+        opp_games = matches.loc[matches['h_a'] == opp_location[0]]
+        form, opp_form = rolling_form(games, n, stats), rolling_form(opp_games, n, stats)
+    else:
+        games = matches
+        form = opp_form = rolling_form(matches, n, stats)
+
+    opp_form = opp_form.rename(columns={'team': 'opp', **{s: f"{OPP_PREFIX}{s}" for s in stats}})
+
+    rows = games[['team', 'opp', 'match_id', target]].rename(columns={target: '_target'})
+    rows = rows.join(form[stats]).merge(opp_form, how='left', on=['opp', 'match_id'], validate='many_to_one')
+    rows = rows.dropna().set_index(['team', 'match_id'])
+
+    return rows.drop(columns=['opp', '_target']), rows['_target'].rename(target)
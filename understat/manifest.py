@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+from typing import Mapping
+
+VALIDATORS = {'ETag': 'If-None-Match', 'Last-Modified': 'If-Modified-Since'}
+
+
+class CrawlManifest:
+    """Record of what was last crawled from each URL, used for incremental crawls
+
+    Stores the HTTP validators (ETag/Last-Modified) returned for each URL and a content hash of each javascript
+    variable found in its page. Changes seen during a crawl are staged, and only committed once the outputs for that
+    URL have been written, so a failed write is retried on the next crawl.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path to manifest json file, created on save if it does not exist
+        """
+        self.path = path
+        self.entries = {}
+        self._staged = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def headers(self, url: str) -> dict:
+        """Get conditional request headers for a URL
+        :param url: page url
+        :return: dict of headers, empty if URL has not been crawled before
+        """
+        validators = self.entries.get(url, {}).get('validators', {})
+        return {VALIDATORS[k]: v for k, v in validators.items()}
+
+    def stage_validators(self, url: str, headers: Mapping) -> None:
+        """Stage HTTP validators from response headers
+        :param url: page url
+        :param headers: response headers
+        """
+        validators = {k: headers[k] for k in VALIDATORS if k in headers}
+        self._staged.setdefault(url, {})['validators'] = validators
+
+    def stage(self, url: str, var: str, content: str) -> None:
+        """Stage content hash of a javascript variable
+        :param url: page url
+        :param var: javascript variable name
+        :param content: raw variable content, as found in page
+        """
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        self._staged.setdefault(url, {}).setdefault('hashes', {})[var] = digest
+
+    def changed(self, url: str) -> set:
+        """Get variables whose staged content differs from the last committed crawl
+        :param url: page url
+        :return: set of changed variable names
+        """
+        staged = self._staged.get(url, {}).get('hashes', {})
+        committed = self.entries.get(url, {}).get('hashes', {})
+        return {var for var, digest in staged.items() if committed.get(var) != digest}
+
+    def commit(self, url: str) -> None:
+        """Commit staged validators and hashes for a URL, once its outputs have been written
+        :param url: page url
+        """
+        staged = self._staged.pop(url, {})
+        entry = self.entries.setdefault(url, {})
+
+        if 'validators' in staged:
+            entry['validators'] = staged['validators']
+
+        entry.setdefault('hashes', {}).update(staged.get('hashes', {}))
+
+    def save(self) -> None:
+        """Write committed entries to manifest file, replacing atomically"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+
+        os.replace(tmp_path, self.path)
@@ -1,104 +1,113 @@
+import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error
-from sklearn.model_selection import cross_val_score, train_test_split
-from understat.analyse import get_team_history, get_teams_in_league
+from utils.cache import ArtifactCache
+from understat.analyse import get_team_matches, get_team_matches_files, get_teams_in_league
+from understat.features import STATS, build_features
+
+N = 3
+TEST_SIZE = 0.2
+CV = 10
+# Built features and fitted models, reused until their season data or parameters change. Kept out of the package tree,
+# in ODDS_CACHE_DIR if set, otherwise the user's cache directory
+CACHE_DIR = os.environ.get('ODDS_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'odds')
+CACHE = ArtifactCache(CACHE_DIR)
+
+
+def fit_model(inp, out, model=None, test_size: float = TEST_SIZE, cv: int = CV, random_state: int = 0) -> dict:
+    """Fit model on a train split, then score it on the test split and by cross-validation over all rows
+    :param inp: feature data frame
+    :param out: target series
+    :param model: unfitted sklearn estimator, default = LinearRegression
+    :param test_size: proportion of rows held out for testing
+    :param cv: number of cross-validation folds
+    :param random_state: seed of train/test split
+    :return: dict of fitted model, test rmse, cross-validated rmse per fold, coefficients (sorted by magnitude, None
+        if model has neither coefficients nor feature importances) and the test split with its predictions
+    """
+    # Imported here so that importing this module does not pay for sklearn
+    from sklearn.base import clone
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import cross_val_score, train_test_split
+
+    model = LinearRegression() if model is None else clone(model)
+
+    X_train, X_test, y_train, y_test = train_test_split(inp, out, test_size=test_size, random_state=random_state)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+
+    weights = getattr(model, 'coef_', getattr(model, 'feature_importances_', None))
+    coefficients = None
+    if weights is not None:
+        coefficients = pd.DataFrame(weights, inp.columns, columns=['Coefficients'])
+        coefficients.sort_values('Coefficients', inplace=True, ascending=False, key=abs)
+
+    scores = cross_val_score(clone(model), inp, out, scoring="neg_mean_squared_error", cv=cv)
+
+    return {
+        'model': model,
+        'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
+        'cv_rmse': np.sqrt(-scores),
+        'coefficients': coefficients,
+        'X_test': X_test,
+        'y_test': y_test,
+        'y_pred': y_pred,
+    }
+
+
+def correlation_test(league: str = 'EPL', year: str = '2020', n: int = N, stats=STATS, model=None,
+                     cache: ArtifactCache = CACHE) -> dict:
+    """Correlating previous n games to n+1 game, without plotting (see understat.plots)
+    :param league: league directory string
+    :param year: year directory string or integer
+    :param n: number of previous games to average over
+    :param stats: stats averaged for team and opponent
+    :param model: unfitted sklearn estimator, default = LinearRegression
+    :param cache: cache of built features and fitted models, None to always rebuild
+    :return: results of fit_model, with league, year, n, target and per-game means of each team
+    """
+    teams = get_teams_in_league(league, year)
+    stats = list(stats)
 
+    def build():
+        matches = get_team_matches(league, year, teams)
+        per_game = matches.groupby('team').mean(numeric_only=True).transpose()
+        return (*build_features(matches, n, stats), per_game[teams])
 
-def correlation_test():
-    """Correlating previous n weeks to n+1 week"""
-    league = 'EPL'
-    year = '2020'
-    N = 3
+    if cache is None:
+        inp, out, per_game = build()
+        results = fit_model(inp, out, model)
+    else:
+        files = get_team_matches_files(league, year, teams)
+        params = dict(league=league, year=str(year), n=n, stats=stats, teams=teams)
 
-    teams = get_teams_in_league(league, year)
+        inp, out, per_game = cache.get_or_compute(cache.key(files, artifact='features', **params), build)
+        key = cache.key(files, artifact='model', model=model_params(model), test_size=TEST_SIZE, cv=CV, **params)
+        results = cache.get_or_compute(key, lambda: fit_model(inp, out, model))
+
+    results.update(league=league, year=year, n=n, target=out.name, per_game=per_game)
+
+    return results
 
-    history = get_team_history(league, year, 0, teams)
-    dim = history[0].shape
-
-    # TODO: Put all in multi-level df
-    pre_list = []
-    res_list = []
-    opp_list = []
-    for team, games in zip(teams, history):
-        for idx in range(0, dim[0] - N):
-
-            stop = idx + N
-            name = f"{team}{idx}"
-            # Not actually numeric here as reading from csv, but pd.mean automatically converts objects to numeric types
-            # and drops others
-            pre = games.iloc[idx:stop]
-            pre_series = pre.mean(numeric_only=True)
-            pre_series.name = name
-            pre_list.append(pre_series)
-
-            # Selecting next game (looks same as last entry above, but remember : indexing is exclusive on RHS
-            # Turning objects to numeric manually (Series function), setting errors to NaN and dropping
-            next_game = games.iloc[stop]
-            res_series = pd.to_numeric(next_game, errors='coerce').dropna()
-            res_series.name = name
-            res_list.append(res_series)
-
-            opp_series = history[teams.index(next_game.opp)][idx:stop].mean(numeric_only=True)
-            opp_series.name = name
-            opp_list.append(opp_series)
-
-    # Turning list of Series to df
-    pre = pd.concat(pre_list, axis=1)
-    res = pd.concat(res_list, axis=1)
-    opp_pre = pd.concat(opp_list, axis=1)
-
-    pre = pre.transpose().select_dtypes(include=[np.number])
-    opp_pre = opp_pre.transpose().select_dtypes(include=[np.number])
-    opp_pre = opp_pre.add_prefix("opp_")
-
-    inp = pd.concat([pre, opp_pre], axis=1)
-    inp.drop(columns=list(inp.filter(regex='npx')), inplace=True)
-    out = res.loc["xG"]
-
-    X_train, X_test, y_train, y_test = train_test_split(inp, out, test_size=0.2, random_state=0)
-
-    lin_reg = LinearRegression()
-    lin_reg.fit(X_train, y_train)
-
-    y_pred = lin_reg.predict(X_test)
-    mse = mean_squared_error(y_test, y_pred)
-    rmse = np.sqrt(mse)
-
-    cdf = pd.DataFrame(lin_reg.coef_, inp.columns, columns=['Coefficients'])
-    cdf.sort_values('Coefficients', inplace=True, ascending=False, key=abs)
-    scores = cross_val_score(lin_reg, inp, out,
-                             scoring="neg_mean_squared_error", cv=10)
-    cross_rmse = np.sqrt(-scores)
-
-    # plt.subplots(2, 3)
-    nPlot = 6
-    names = cdf.index.values[:nPlot]
-    fig, axs = plt.subplots(2, 3, constrained_layout=True)
-    # fig.tight_layout()
-    fig.suptitle(f"xG prediction by previous {N} games: Top {nPlot} correlations")
-    for ax, name in zip(axs.ravel(), names):
-        ax.set_title("corr = {0:.3f}".format(cdf.loc[name][0]))
-        ax.scatter(X_test[name], y_test, color="black")
-        ax.scatter(X_test[name], y_pred, color="blue")
-        ax.set_xlabel(name)
-        ax.set_ylabel("xG")
-
-    # plt.xticks(())
-    # plt.yticks(())
-    plt.show()
-
-    per_game = []
-    for hist in history:
-        per_game.append(hist.mean(numeric_only=True))
-
-    per_game = pd.concat(per_game, axis=1)
-    per_game.columns = teams
-    return per_game
+
+def model_params(model) -> str:
+    """Describe estimator by class and parameters, for use in cache keys
+    :param model: unfitted sklearn estimator, or None for the default
+    :return: description string
+    """
+    if model is None:
+        return 'default'
+
+    params = sorted(model.get_params(deep=True).items())
+    return f"{type(model).__module__}.{type(model).__qualname__}{params!r}"
 
 
 if __name__ == "__main__":
 
-    correlation_test()
+    from understat.plots import plot_correlations
+
+    results = correlation_test()
+    print(f"Test RMSE: {results['rmse']:.3f}, CV RMSE: {results['cv_rmse'].mean():.3f}")
+    plot_correlations(results)
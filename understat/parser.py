@@ -10,8 +10,19 @@ import re
 import sys
 import json
 import pathlib
+from typing import Optional
 from aiohttp import ClientSession
-from utils.gen import get_path, dict2csv, flatten_dict
+from utils.gen import get_path, Flattener
+from utils.crawl import CrawlScheduler
+from utils.storage import write_table, WriterPool
+from understat.manifest import CrawlManifest
+from understat.schema import SCHEMAS
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    json_loads = json.loads
 
 logging.basicConfig(
     format="%(asctime)s %(levelname)s:%(name)s: %(message)s",
@@ -24,38 +35,68 @@ logging.getLogger("chardet.charsetprober").disabled = True
 
 BASE_URL = 'https://understat.com/league'
 JS_VARS = ("datesData", "playersData", "teamsData")
-RE_STRING = r"{}\s*=\s*JSON.parse(.*?)\)"
+# Any `name = JSON.parse('...')`, with the single-quoted javascript string body (escapes included) as second group.
+# Understat escapes quotes as \x27 so the fast pattern normally suffices, the escape-aware one is a fallback for \'
+RE_JSON_PARSE = re.compile(r"\b(\w+)\s*=\s*JSON\.parse\(\s*'([^']*)'\s*\)")
+RE_JSON_PARSE_ESCAPED = re.compile(r"\b(\w+)\s*=\s*JSON\.parse\(\s*'([^'\\]*(?:\\.[^'\\]*)*)'\s*\)", flags=re.DOTALL)
+# One of utils.storage.FORMATS, columnar formats (parquet/feather) are stored typed
 OUT_FORMAT = 'csv'
+TEAM_MATCHES = 'team_matches'
+MANIFEST = 'manifest.json'
 HERE = pathlib.Path(__file__).parent
 
 
-async def fetch_html(url: str, session: ClientSession, **kwargs) -> str:
+async def fetch_html(url: str, session: ClientSession, manifest: CrawlManifest = None, **kwargs) -> Optional[str]:
     """GET request wrapper to fetch page HTML.
     kwargs are passed to `session.request()`.
+    If a manifest is given the request is conditional on the page having changed since the last crawl, returning None
+    if not modified.
     """
+    if manifest is not None:
+        kwargs['headers'] = {**kwargs.get('headers', {}), **manifest.headers(url)}
+
+    async with session.request(method="GET", url=url, **kwargs) as resp:
+        if resp.status == 304:
+            logger.info("Not modified [%s] for URL: %s", resp.status, url)
+            return None
+
+        resp.raise_for_status()
+        logger.info("Got response [%s] for URL: %s", resp.status, url)
+
+        if manifest is not None:
+            manifest.stage_validators(url, resp.headers)
+
+        html = await resp.text()
 
-    resp = await session.request(method="GET", url=url, **kwargs)
-    resp.raise_for_status()
-    logger.info("Got response [%s] for URL: %s", resp.status, url)
-    html = await resp.text()
     return html
 
 
-async def parse(url: str, var, session: ClientSession, **kwargs):
-    """Find HREFs in the HTML of `url`."""
-    # TODO: MERGE WITH FETCH_HTML
-    html = await fetch_html(url=url, session=session, **kwargs)
+def parse(html: str, js_vars: tuple) -> dict:
+    """Find all `js_vars` in `html` in a single scan.
+    :param html: page HTML
+    :param js_vars: javascript variable names to find
+    :return: dict of raw (still escaped) variable content by variable name, first occurrence of each
+    """
+    found = {}
+    for re_json in (RE_JSON_PARSE, RE_JSON_PARSE_ESCAPED):
+        for var, content in re_json.findall(html):
+            # An odd number of trailing backslashes means the fast pattern stopped at an escaped quote
+            escaped_end = (len(content) - len(content.rstrip('\\'))) % 2
+            if var in js_vars and not escaped_end:
+                found.setdefault(var, content)
+
+        if len(found) == len(js_vars):
+            break
 
-    re_var = re.compile(RE_STRING.format(var), flags=re.DOTALL)
-    data = re_var.findall(html)
-    data = var2dict(data)
-    return data
+    missing = set(js_vars) - set(found)
+    if missing:
+        logger.warning("Variables not found in page: %s", sorted(missing))
 
+    return found
 
-async def write_one(url: str, var: str, path: str, **kwargs) -> None:
-    """Write the found HREFs from `url` to `file`."""
-    data = await parse(url, var, **kwargs)
 
+def write_one(url: str, var: str, path: str, data) -> None:
+    """Write the parsed `var` data from `url` to `path`."""
     if not data:
         return None
 
@@ -73,29 +114,123 @@ async def write_one(url: str, var: str, path: str, **kwargs) -> None:
     if var == "teamsData":
         data = format_teams(data, path)
 
-    out = []
-    try:
-        if isinstance(data, dict):
-            data = [data]
-        for row in data:
-            out.append(flatten_dict(row))
-    except Exception as e:
-        print(e)
-
-    await dict2csv(out, full_path)
+    if isinstance(data, dict):
+        data = [data]
+
+    # Rows are flattened as they are written rather than all held in memory at once
+    flatten = Flattener()
+    write_table((flatten(row) for row in data), full_path, schema=SCHEMAS.get(var))
     logger.info("Wrote results for source URL: %s", url)
 
 
-async def bulk_crawl_and_write(urls: list, paths: list, js_vars: tuple, **kwargs) -> None:
-    """Crawl & write concurrently to `file` for multiple `urls`."""
-    async with ClientSession() as session:
+def write_all(url: str, path: str, raw: dict, changed: set) -> None:
+    """Decode raw javascript variables from `url` and write those that have changed to `path`, along with the
+    consolidated team-match table. Blocking, run on the writer pool."""
+    data = {var: var2dict(content, var) for var, content in raw.items()}
+
+    # Built before writing as format_teams strips the history from teamsData
+    if {"datesData", "teamsData"} & changed and data.get("datesData") and data.get("teamsData"):
+        matches = build_team_matches(data["datesData"], data["teamsData"])
+        write_one(url, TEAM_MATCHES, path, matches)
+
+    for var in raw:
+        if var in changed:
+            write_one(url, var, path, data[var])
+
+
+async def crawl_one(url: str, path: str, js_vars: tuple, scheduler: CrawlScheduler, writer: WriterPool,
+                    manifest: CrawlManifest = None, **kwargs) -> None:
+    """Crawl all `js_vars` from `url` and write to `path`, along with the consolidated team-match table.
+    If a manifest is given only outputs whose data has changed since the last crawl are rewritten."""
+    html = await scheduler.fetch(url, fetch_html, manifest=manifest, **kwargs)
+    if html is None:
+        return None
+
+    raw = parse(html, js_vars)
+    if manifest is not None:
+        for var, content in raw.items():
+            manifest.stage(url, var, content)
+
+    changed = set(js_vars) if manifest is None else manifest.changed(url)
+    if not changed:
+        logger.info("No changes for URL: %s", url)
+        # Nothing to write, but new validators must still be kept for the next conditional request
+        if manifest is not None:
+            manifest.commit(url)
+        return None
+
+    # Decoding and disk I/O run on the writer pool, the fetch slot is already free for other URLs
+    await (await writer.submit(write_all, url, path, raw, changed))
+
+    if manifest is not None:
+        manifest.commit(url)
+
+
+async def bulk_crawl_and_write(urls: list, paths: list, js_vars: tuple, manifest: CrawlManifest = None,
+                               scheduler: CrawlScheduler = None, writer: WriterPool = None, **kwargs) -> dict:
+    """Crawl & write concurrently to `file` for multiple `urls`.
+    If a manifest is given the crawl is incremental, and the manifest is saved once finished.
+    Failure of one URL does not stop the others, failures are logged and returned.
+    :return: dict of exceptions by failed URL, empty if all succeeded
+    """
+    scheduler = scheduler or CrawlScheduler()
+    writer = writer or WriterPool()
+    async with scheduler, writer:
         tasks = []
         for url, path in zip(urls, paths):
-            for var in js_vars:
-                tasks.append(
-                    write_one(url=url, session=session, var=var, path=path, **kwargs)
-                )
-        await asyncio.gather(*tasks)
+            tasks.append(
+                crawl_one(url=url, js_vars=js_vars, path=path, scheduler=scheduler, writer=writer, manifest=manifest,
+                          **kwargs)
+            )
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Only URLs whose outputs were fully written have been committed
+    if manifest is not None:
+        manifest.save()
+
+    failed = {url: result for url, result in zip(urls, results) if isinstance(result, Exception)}
+    for url, error in failed.items():
+        logger.error("Failed to crawl URL: %s (%r)", url, error)
+
+    logger.info("Crawled %d/%d URLs", len(urls) - len(failed), len(urls))
+    return failed
+
+
+def build_team_matches(dates: list, teams: dict) -> list:
+    """Build long-format team-match table, one row per team per game, keyed by team and match id
+    :param dates: parsed datesData, list of matches
+    :param teams: parsed teamsData, dict of teams containing game history
+    :return: list of flattened rows sorted by team and date
+    """
+    # Each team plays at most once at a given datetime, so (team id, datetime) identifies a match
+    fixtures = {}
+    for match in dates:
+        for side, other in (('h', 'a'), ('a', 'h')):
+            fixtures[(match[side]['id'], match['datetime'])] = {
+                'opp': match[other]['title'],
+                'opp_id': match[other]['id'],
+                'match_id': match['id'],
+                'goals_for': match['goals'][side],
+                'goals_against': match['goals'][other],
+                'xG_for': match['xG'][side],
+                'xG_against': match['xG'][other],
+            }
+
+    flatten = Flattener()
+    rows = []
+    for team in teams.values():
+        for game in team['history']:
+            try:
+                fixture = fixtures[(team['id'], game['date'])]
+            except KeyError:
+                raise ValueError(f"No match found in datesData for team '{team['title']}' on {game['date']}")
+
+            row = {'team': team['title'], 'team_id': team['id'], 'date': game['date'], **fixture}
+            row.update(flatten(game))
+            rows.append(row)
+
+    rows.sort(key=lambda r: (r['team'], r['date']))
+    return rows
 
 
 def format_teams(data, path):
@@ -104,15 +239,16 @@ def format_teams(data, path):
     for _, val in data.items():
         lst.append(val)
 
+    flatten = Flattener()
     league = []
     for team in lst:
         p = os.path.join(path, team['title'].replace(" ", "_"))
         if not os.path.isdir(p):
             os.makedirs(p)
 
-        hst = [flatten_dict(row) for row in team['history']]
+        hst = [flatten(row) for row in team['history']]
         filename = f"team_data.{OUT_FORMAT}"
-        dict2csv(hst, os.path.join(p, filename))
+        write_table(hst, os.path.join(p, filename), schema=SCHEMAS['team_data'])
 
         try:
             rm = ['history']
@@ -150,17 +286,31 @@ def get_urls(leagues: (list, int), years: (list, str)) -> list:
     return url
 
 
-def var2dict(data):
+def var2dict(data: str, var: str = None):
     """Function to parse javascript variable to dict format. Potentially specific to understat which uses json.parse and
-    hex codes to generate data"""
-    # Hack to get rid of brackets and leading apostrophe
-    # Bigger hack to do this encoding nonsense
-    # https://stackoverflow.com/questions/38763771/how-do-i-remove-double-back-slash-from-a-bytes-object
-    formatted_data = json.loads(data[0][2:-1].encode().decode('unicode_escape').encode("raw_unicode_escape"))
-    return formatted_data
+    hex codes to generate data
+    :param data: raw javascript string content passed to JSON.parse, as found by `parse`
+    :param var: variable name, for error messages
+    :return: decoded data
+    """
+    # Javascript \xNN and \uXXXX escapes are code points, as in python's unicode_escape codec. Any characters outside
+    # latin-1 are first turned into \uXXXX escapes themselves, so that the whole string decodes in one C-level pass
+    try:
+        text = data.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+    except UnicodeDecodeError as e:
+        context = data[max(e.start - 40, 0):e.start + 40]
+        raise ValueError(f"Malformed escape in variable '{var}' at position {e.start}: {e.reason} (near {context!r})") \
+            from e
+
+    try:
+        return json_loads(text)
+    except ValueError as e:
+        pos = getattr(e, 'pos', None) or 0
+        context = text[max(pos - 40, 0):pos + 40]
+        raise ValueError(f"Malformed JSON in variable '{var}' at position {pos}: {e} (near {context!r})") from e
 
 
-def main():
+def main(incremental: bool = True):
     assert sys.version_info >= (3, 7), "Script requires Python 3.7+."
 
     leagues = ['EPL', 'La_liga']
@@ -170,9 +320,12 @@ def main():
     paths = []
     for league in leagues:
         for year in years:
-            paths.append(get_path(league, str(year), base_path=BASE_URL))
+            paths.append(get_path(league, str(year), base_path=str(HERE)))
 
-    asyncio.run(bulk_crawl_and_write(urls=urls, paths=paths, js_vars=JS_VARS))
+    manifest = CrawlManifest(get_path(MANIFEST, base_path=str(HERE))) if incremental else None
+    failed = asyncio.run(bulk_crawl_and_write(urls=urls, paths=paths, js_vars=JS_VARS, manifest=manifest))
+    if failed:
+        sys.exit(f"Failed to crawl {len(failed)} URLs: {list(failed)}")
 
 
 if __name__ == "__main__":
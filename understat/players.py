@@ -0,0 +1,145 @@
+from typing import Iterable, List, Optional
+import pandas as pd
+from understat.catalog import DataCatalog
+from utils.storage import read_table
+
+# Separator between teams in 'team_title' for players who moved mid-season (e.g. loanees)
+TEAM_SEPARATOR = ','
+
+
+class SeasonPlayers:
+    """Player stats of one league season, indexed by team and by player id
+
+    Players listed under several teams (e.g. "Team A,Team B") are indexed under each of them.
+    """
+
+    def __init__(self, players: pd.DataFrame, league: str, year: str):
+        """
+        :param players: playersData for the season, one row per player
+        :param league: league directory name
+        :param year: year directory name
+        """
+        self.league = league
+        self.year = str(year)
+        self.players = players.reset_index(drop=True)
+
+        teams = self.players['team_title'].str.split(TEAM_SEPARATOR).explode().str.strip()
+        self.by_team = {team: idx.to_numpy() for team, idx in teams.groupby(teams, sort=False).groups.items()}
+        self.by_id = self.players.groupby('id', sort=False).indices
+
+    def teams(self) -> List[str]:
+        """Get teams with at least one player in the season"""
+        return list(self.by_team)
+
+    def team(self, team: str) -> pd.DataFrame:
+        """Get players who played for a team during the season
+        :param team: team name
+        :return: data frame of players, empty if team not found
+        """
+        return self.players.iloc[self.by_team.get(team, [])]
+
+    def player(self, player_id: str) -> pd.DataFrame:
+        """Get season row(s) of a player
+        :param player_id: understat player id
+        :return: data frame of player rows, empty if player not found
+        """
+        return self.players.iloc[self.by_id.get(str(player_id), [])]
+
+
+class PlayerIndex:
+    """Player stats across leagues and seasons, built once per season and rebuilt only when its data file changes"""
+
+    def __init__(self, catalog: DataCatalog, filename: str, schema: dict = None):
+        """
+        :param catalog: catalog of the understat data tree
+        :param filename: players data file name, including extension
+        :param schema: declared column types of players data (see utils.storage.apply_schema)
+        """
+        self.catalog = catalog
+        self.filename = filename
+        self.schema = schema
+
+    def season(self, league: str, year: str) -> Optional[SeasonPlayers]:
+        """Get indexed players of a league season
+        :param league: league directory name
+        :param year: year directory name
+        :return: indexed season, or None if players data not found
+        """
+        path = self.catalog.file_path(league, year, self.filename)
+        if path is None:
+            return None
+
+        return self.catalog.cached(path, lambda p: SeasonPlayers(read_table(p, schema=self.schema), league, year))
+
+    def seasons(self, leagues: Iterable[str] = None, years: Iterable = None) -> List[SeasonPlayers]:
+        """Get indexed players of every available season within leagues and years
+        :param leagues: leagues to include, default = all
+        :param years: years to include (e.g. range(2018, 2021)), default = all
+        :return: list of indexed seasons
+        """
+        leagues = self.catalog.leagues() if leagues is None else leagues
+        years = None if years is None else {str(y) for y in years}
+
+        seasons = []
+        for league in leagues:
+            for year in sorted(self.catalog.seasons(league)):
+                if years is not None and year not in years:
+                    continue
+
+                season = self.season(league, year)
+                if season is not None:
+                    seasons.append(season)
+
+        return seasons
+
+    def team(self, team: str, league: str, year: str) -> pd.DataFrame:
+        """Get players who played for a team in a given season
+        :param team: team name
+        :param league: league directory name
+        :param year: year directory name
+        :return: data frame of players, empty if team not found
+        """
+        season = self.season(league, year)
+        if season is None:
+            raise ValueError(f"No {self.filename} found for league: {league}, year: {year}")
+
+        return season.team(team)
+
+    def player(self, player_id: str, leagues: Iterable[str] = None, years: Iterable = None) -> pd.DataFrame:
+        """Get season rows of a player across leagues and seasons
+        :param player_id: understat player id
+        :param leagues: leagues to include, default = all
+        :param years: years to include, default = all
+        :return: data frame of player rows with 'league' and 'year' columns
+        """
+        return self.query(player_ids=[player_id], leagues=leagues, years=years)
+
+    def query(self, teams: Iterable[str] = None, player_ids: Iterable[str] = None, leagues: Iterable[str] = None,
+              years: Iterable = None) -> pd.DataFrame:
+        """Get player rows matching all given filters across leagues and seasons
+        :param teams: teams to include, default = all
+        :param player_ids: understat player ids to include, default = all
+        :param leagues: leagues to include, default = all
+        :param years: years to include, default = all
+        :return: data frame of player rows with 'league' and 'year' columns
+        """
+        teams = None if teams is None else list(teams)
+        player_ids = None if player_ids is None else [str(p) for p in player_ids]
+
+        frames = []
+        for season in self.seasons(leagues, years):
+            # Row positions from each index lookup, intersected when filtering on both
+            selected = []
+            if teams is not None:
+                selected.append({i for t in teams for i in season.by_team.get(t, ())})
+            if player_ids is not None:
+                selected.append({i for p in player_ids for i in season.by_id.get(p, ())})
+
+            idx = sorted(set.intersection(*selected)) if selected else range(len(season.players))
+            if len(idx):
+                frames.append(season.players.iloc[idx].assign(league=season.league, year=season.year))
+
+        if not frames:
+            return pd.DataFrame(columns=list(self.schema or ()) + ['league', 'year'])
+
+        return pd.concat(frames, ignore_index=True)
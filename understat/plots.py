@@ -0,0 +1,45 @@
+"""Reporting plots of model results. matplotlib is only imported when plotting, and figures saved to file are drawn
+without pyplot, so no display is needed."""
+from typing import Optional
+
+N_PLOT = 6
+
+
+def plot_correlations(results: dict, path: Optional[str] = None, n_plot: int = N_PLOT):
+    """Scatter test-set predictions and targets against the most heavily weighted features
+    :param results: results of models.correlation_test (or fit_model with 'n' and 'target' added)
+    :param path: file to save figure to (format from extension), default = show interactively
+    :param n_plot: number of features to plot, in rows of three
+    :return: matplotlib figure
+    """
+    coefficients = results['coefficients']
+    if coefficients is None:
+        raise ValueError("Model has no coefficients to plot")
+
+    names = coefficients.index.values[:n_plot]
+    rows = -(-len(names) // 3)
+
+    if path is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(constrained_layout=True)
+    else:
+        from matplotlib.figure import Figure
+        fig = Figure(constrained_layout=True)
+
+    axs = fig.subplots(rows, 3, squeeze=False)
+    target = results.get('target', 'xG')
+    fig.suptitle(f"{target} prediction by previous {results.get('n')} games: Top {len(names)} correlations")
+
+    for ax, name in zip(axs.ravel(), names):
+        ax.set_title("corr = {0:.3f}".format(coefficients.loc[name, 'Coefficients']))
+        ax.scatter(results['X_test'][name], results['y_test'], color="black")
+        ax.scatter(results['X_test'][name], results['y_pred'], color="blue")
+        ax.set_xlabel(name)
+        ax.set_ylabel(target)
+
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+
+    return fig
@@ -0,0 +1,103 @@
+"""Declared column types of each understat dataset, as flattened and written by the parser.
+
+Types are names understood by utils.storage.apply_schema. Identifiers are kept as strings, they are labels rather
+than quantities.
+"""
+from utils.storage import STR, INT, FLOAT, BOOL, DATETIME
+
+DATES = {
+    'id': STR,
+    'isResult': BOOL,
+    'h_id': STR,
+    'h_title': STR,
+    'h_short_title': STR,
+    'a_id': STR,
+    'a_title': STR,
+    'a_short_title': STR,
+    'goals_h': INT,
+    'goals_a': INT,
+    'xG_h': FLOAT,
+    'xG_a': FLOAT,
+    'datetime': DATETIME,
+    'forecast_w': FLOAT,
+    'forecast_d': FLOAT,
+    'forecast_l': FLOAT,
+}
+
+PLAYERS = {
+    'id': STR,
+    'player_name': STR,
+    'games': INT,
+    'time': INT,
+    'goals': INT,
+    'xG': FLOAT,
+    'assists': INT,
+    'xA': FLOAT,
+    'shots': INT,
+    'key_passes': INT,
+    'yellow_cards': INT,
+    'red_cards': INT,
+    'position': STR,
+    'team_title': STR,
+    'npg': INT,
+    'npxG': FLOAT,
+    'xGChain': FLOAT,
+    'xGBuildup': FLOAT,
+}
+
+# Numeric game stats, summed over the season in teamsData
+HISTORY_STATS = {
+    'xG': FLOAT,
+    'xGA': FLOAT,
+    'npxG': FLOAT,
+    'npxGA': FLOAT,
+    'ppda_att': INT,
+    'ppda_def': INT,
+    'ppda_allowed_att': INT,
+    'ppda_allowed_def': INT,
+    'deep': INT,
+    'deep_allowed': INT,
+    'scored': INT,
+    'missed': INT,
+    'xpts': FLOAT,
+    'wins': INT,
+    'draws': INT,
+    'loses': INT,
+    'pts': INT,
+    'npxGD': FLOAT,
+}
+
+HISTORY = {
+    'h_a': STR,
+    'result': STR,
+    'date': DATETIME,
+    **HISTORY_STATS,
+}
+
+TEAMS = {
+    'id': STR,
+    'title': STR,
+    **HISTORY_STATS,
+}
+
+TEAM_MATCHES = {
+    'team': STR,
+    'team_id': STR,
+    'opp': STR,
+    'opp_id': STR,
+    'match_id': STR,
+    'goals_for': INT,
+    'goals_against': INT,
+    'xG_for': FLOAT,
+    'xG_against': FLOAT,
+    **HISTORY,
+}
+
+# By dataset (file) name
+SCHEMAS = {
+    'datesData': DATES,
+    'playersData': PLAYERS,
+    'teamsData': TEAMS,
+    'team_data': HISTORY,
+    'team_matches': TEAM_MATCHES,
+}
@@ -0,0 +1,175 @@
+"""Expected strength of starting line-ups (e.g. scraped by sportsgambler.scraper) from understat player season stats"""
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from utils.matching import NameMatcher
+from understat.players import SeasonPlayers
+
+# Per-90 stats summed over a line-up
+STATS = ('xG', 'xA', 'xGChain')
+# Minutes below which per-90 rates are taken over this many minutes instead, shrinking small samples towards zero
+MIN_MINUTES = 270
+XI = 11
+# Player id of unresolved line-up entries, mapped to a row of zeros
+UNRESOLVED = -1
+# Ratio below which a scraped team or player name is left unresolved rather than matched to the closest in the season
+MIN_RATIO = 0.6
+
+
+class LineupStrength:
+    """Per-90 rates of a season's players, with line-up name resolution and batch strength of starting XIs
+
+    Rates are held in one contiguous array, one row per player id (plus a final row of zeros for unresolved players),
+    so the strength of any number of line-ups is a single gather and sum over an array of ids.
+    """
+
+    def __init__(self, season: SeasonPlayers, stats: Tuple[str] = STATS, min_minutes: int = MIN_MINUTES,
+                 min_ratio: float = MIN_RATIO, aliases_path: str = None):
+        """
+        :param season: indexed players of a season, see understat.players.PlayerIndex
+        :param stats: stats of players data to take per-90 rates of
+        :param min_minutes: minutes below which rates are shrunk towards zero
+        :param min_ratio: match ratio below which a scraped team or player name is left unresolved
+        :param aliases_path: json file of remembered name aliases (see utils.matching.NameMatcher), see save_aliases.
+            Only confident matches are remembered, not every match above min_ratio
+        """
+        self.season = season
+        self.stats = list(stats)
+        self.min_ratio = min_ratio
+        self.aliases_path = aliases_path
+
+        players = season.players
+        ids = players['id'].astype(int).to_numpy()
+        minutes = np.maximum(players['time'].to_numpy(dtype=float), min_minutes)
+
+        self.rates = np.zeros((ids.max() + 2 if len(ids) else 1, len(self.stats)))
+        self.rates[ids] = players[self.stats].to_numpy(dtype=float) * 90 / minutes[:, np.newaxis]
+        self.minutes = np.zeros(len(self.rates))
+        self.minutes[ids] = players['time'].to_numpy(dtype=float)
+
+        self._ids = ids
+        # Scraped team names are often full club names, e.g. "Brighton & Hove Albion" for "Brighton"
+        self.team_matcher = NameMatcher(season.teams(), aliases_path=aliases_path, prefixes=True)
+        self._squads = {}
+
+    @classmethod
+    def from_season(cls, league: str, year: str, **kwargs) -> 'LineupStrength':
+        """Build from the players data of a season in the data tree
+        :param league: league directory name
+        :param year: year directory name
+        :param kwargs: passed to LineupStrength
+        """
+        from understat.analyse import get_player_index
+
+        season = get_player_index().season(league, year)
+        if season is None:
+            raise ValueError(f"No players data found for league: {league}, year: {year}")
+
+        return cls(season, **kwargs)
+
+    def _squad(self, team: str) -> Tuple[NameMatcher, dict, np.array]:
+        """Get name matcher, player id by name and player ids of a team's squad, built on first use"""
+        if team not in self._squads:
+            idx = self.season.by_team[team]
+            names = self.season.players['player_name'].to_numpy()[idx]
+            matcher = NameMatcher(names)
+            # Aliases are shared by all matchers, each only uses those pointing to one of its own candidates
+            matcher.aliases = self.team_matcher.aliases
+
+            ids = self._ids[idx]
+            by_name = {}
+            for name, player_id in zip(names, ids):
+                by_name.setdefault(name, player_id)
+            self._squads[team] = (matcher, by_name, ids)
+
+        return self._squads[team]
+
+    def save_aliases(self) -> None:
+        """Write team and player name aliases remembered so far to aliases_path"""
+        self.team_matcher.save()
+
+    def resolve(self, team: str, players: List[str]) -> Tuple[str, np.array]:
+        """Resolve scraped team and player names to understat team and player ids
+        :param team: team name as scraped
+        :param players: player names as scraped
+        :return: understat team name (None if not found in season), and array of player ids (UNRESOLVED where not
+            found in squad)
+        """
+        match, ratio = self.team_matcher.match(team) if team else (None, 0.0)
+        if match is None or ratio < self.min_ratio:
+            print(f"No team matching '{team}' in league: {self.season.league}, year: {self.season.year}")
+            return None, np.full(len(players), UNRESOLVED)
+
+        team = match
+        matcher, by_name, _ = self._squad(team)
+
+        resolved = np.full(len(players), UNRESOLVED)
+        for i, (name, ratio) in enumerate(matcher.match_all(players)):
+            if name is not None and ratio >= self.min_ratio:
+                resolved[i] = by_name[name]
+
+        return team, resolved
+
+    def resolve_lineups(self, lineups: List[dict]) -> Tuple[List[str], np.array]:
+        """Resolve many scraped line-ups at once
+        :param lineups: dicts of 'team' and 'players', with players as a flat list of names or a list per line
+        :return: understat team names (None where not found), and array of player ids of shape (line-ups, XI), padded
+            with UNRESOLVED
+        """
+        teams = []
+        ids = np.full((len(lineups), XI), UNRESOLVED)
+        for i, lineup in enumerate(lineups):
+            players = lineup['players']
+            if players and isinstance(players[0], list):
+                players = [p for line in players for p in line]
+
+            team, resolved = self.resolve(lineup.get('team'), players[:XI])
+            teams.append(team)
+            ids[i, :len(resolved)] = resolved
+
+        return teams, ids
+
+    def strength(self, ids: np.array) -> np.array:
+        """Sum per-90 rates over players of each line-up
+        :param ids: player ids of shape (line-ups, players), UNRESOLVED entries count as zero
+        :return: array of summed rates, shape (line-ups, stats)
+        """
+        return self.rates[np.asarray(ids)].sum(axis=1)
+
+    def baseline(self, teams: List[str]) -> np.array:
+        """Strength of each team's usual XI, taken as its XI players with most minutes in the season
+        :param teams: understat team names, None for unknown teams
+        :return: array of summed rates, shape (teams, stats), NaN for unknown teams
+        """
+        ids = np.full((len(teams), XI), UNRESOLVED)
+        for i, team in enumerate(teams):
+            if team is not None:
+                squad = self._squad(team)[2]
+                regulars = squad[np.argsort(-self.minutes[squad], kind='stable')[:XI]]
+                ids[i, :len(regulars)] = regulars
+
+        baseline = self.strength(ids)
+        baseline[[team is None for team in teams]] = np.nan
+        return baseline
+
+    def fixtures(self, home: List[dict], away: List[dict]) -> pd.DataFrame:
+        """Strength of both line-ups of many fixtures, and its difference from each team's usual XI
+        :param home: home line-ups, see resolve_lineups (e.g. as returned by sportsgambler.scraper.parse_lineups)
+        :param away: away line-ups, in the same order of fixtures
+        :return: data frame with one row per fixture: team, stats, stats adjusted by baseline ('_adj') and number of
+            resolved players ('resolved'), for each side prefixed with 'h_' or 'a_'. Stats are NaN for sides whose team
+            is not found in the season
+        """
+        sides = {}
+        for side, lineups in (('h', home), ('a', away)):
+            teams, ids = self.resolve_lineups(lineups)
+            xi = self.strength(ids)
+            xi[[team is None for team in teams]] = np.nan
+            adjustment = xi - self.baseline(teams)
+
+            sides[f"{side}_team"] = teams
+            sides.update({f"{side}_{stat}": xi[:, j] for j, stat in enumerate(self.stats)})
+            sides.update({f"{side}_{stat}_adj": adjustment[:, j] for j, stat in enumerate(self.stats)})
+            sides[f"{side}_resolved"] = (ids != UNRESOLVED).sum(axis=1)
+
+        return pd.DataFrame(sides)
@@ -0,0 +1,158 @@
+"""Parallel sweep of match models over leagues, seasons, window sizes, feature subsets and estimators.
+
+Each season is loaded once, then shared with worker processes as an uncompressed feather (Arrow IPC) file that workers
+memory-map, rather than pickling a copy of it into every task. The mapped table is kept by each worker without copying,
+and only the columns a task uses are converted to pandas (a copy freed once the task is done). Results are gathered
+into one table, one row per (league, year, n, features, model).
+
+Run from the repository root with `python -m understat.sweep`
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Mapping, Tuple
+import numpy as np
+import pandas as pd
+from understat.analyse import CATALOG, get_team_matches
+from understat.features import STATS, TARGET, OPP_PREFIX, build_features
+from utils.storage import read_arrow, write_table
+
+NS = (1, 3, 5, 8)
+FEATURES = {'all': STATS}
+CV = 10
+OUT_PATH = 'sweep.parquet'
+# Team-match columns used by build_features besides stats and target
+KEYS = ('team', 'opp', 'match_id', 'date', 'h_a')
+
+# Arrow tables of seasons memory-mapped by this (worker) process, by shared file path
+_seasons = {}
+
+
+def default_models() -> dict:
+    """Get estimators swept by default, by name"""
+    from sklearn.linear_model import LinearRegression, Ridge
+
+    return {'linear': LinearRegression(), 'ridge': Ridge()}
+
+
+def load_seasons(leagues: Iterable[str] = None, years: Iterable = None) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """Load consolidated team-match tables of every available season within leagues and years
+    :param leagues: leagues to include, default = all
+    :param years: years to include (e.g. range(2018, 2021)), default = all
+    :return: dict of team-match data frame by (league, year)
+    """
+    leagues = CATALOG.leagues() if leagues is None else leagues
+    years = None if years is None else {str(y) for y in years}
+
+    seasons = {}
+    for league in leagues:
+        for year in sorted(CATALOG.seasons(league)):
+            if years is None or year in years:
+                seasons[(league, year)] = get_team_matches(league, year)
+
+    return seasons
+
+
+def run_sweep(seasons: Mapping[Tuple[str, str], pd.DataFrame], ns: Iterable[int] = NS,
+              features: Mapping[str, Iterable[str]] = None, models: Mapping = None, cv: int = CV,
+              workers: int = None) -> pd.DataFrame:
+    """Cross-validate every combination of season, window size, feature subset and model on a process pool
+    :param seasons: team-match data frame by (league, year), see load_seasons
+    :param ns: numbers of previous games to average over
+    :param features: stats used as features (for both team and opponent) by subset name, default = FEATURES
+    :param models: unfitted sklearn estimators by name, default = default_models()
+    :param cv: number of cross-validation folds
+    :param workers: number of worker processes, default = number of CPUs, 1 = run in this process
+    :return: data frame of results, one row per combination
+    """
+    features = {name: list(stats) for name, stats in (features or FEATURES).items()}
+    models = models or default_models()
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix='sweep') as shared:
+        tasks = []
+        for (league, year), matches in seasons.items():
+            path = os.path.join(shared, f"{league}_{year}.feather")
+            write_table(matches, path)
+            tasks.extend((path, league, year, n, features, models, cv) for n in ns)
+
+        # A failed task is reported and the rest of the sweep continues, whether run in this process or on the pool
+        if workers == 1:
+            try:
+                for task in tasks:
+                    try:
+                        rows.extend(evaluate_season(*task))
+                    except Exception as e:
+                        _report_failure(task, e)
+            finally:
+                _seasons.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(evaluate_season, *task): task for task in tasks}
+                for future in as_completed(futures):
+                    try:
+                        rows.extend(future.result())
+                    except Exception as e:
+                        _report_failure(futures[future], e)
+
+    results = pd.DataFrame(rows)
+    return results.sort_values(['league', 'year', 'n', 'features', 'model'], ignore_index=True) if rows else results
+
+
+def _report_failure(task: tuple, error: Exception) -> None:
+    """Print failed sweep task"""
+    _, league, year, n = task[:4]
+    print(f"Sweep failed for league: {league}, year: {year}, n: {n} ({error!r})")
+
+
+def evaluate_season(path: str, league: str, year: str, n: int, features: Mapping[str, list], models: Mapping,
+                    cv: int) -> list:
+    """Cross-validate every feature subset and model on one season and window size (run in worker processes)
+    :param path: shared feather file of the season's team-match table
+    :param league: league name, recorded in results
+    :param year: year, recorded in results
+    :param n: number of previous games to average over
+    :param features: stats used as features by subset name
+    :param models: unfitted sklearn estimators by name
+    :param cv: number of cross-validation folds
+    :return: list of result dicts
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import cross_validate
+
+    if path not in _seasons:
+        _seasons[path] = read_arrow(path)
+
+    # Features are built once over all stats in the sweep, then subset per feature set
+    stats = list(dict.fromkeys(s for subset in features.values() for s in subset))
+    columns = [c for c in dict.fromkeys((*KEYS, TARGET, *stats)) if c in _seasons[path].column_names]
+    inp, out = build_features(_seasons[path].select(columns).to_pandas(), n, stats)
+
+    rows = []
+    for name, subset in features.items():
+        X = inp[subset + [f"{OPP_PREFIX}{s}" for s in subset]]
+        for model_name, model in models.items():
+            if len(X) < cv:
+                continue
+
+            scores = cross_validate(clone(model), X, out, cv=cv, scoring=('neg_mean_squared_error', 'r2'))
+            rmse = np.sqrt(-scores['test_neg_mean_squared_error'])
+            rows.append({
+                'league': league, 'year': year, 'n': n, 'features': name, 'model': model_name, 'target': TARGET,
+                'rows': len(X), 'rmse': rmse.mean(), 'rmse_std': rmse.std(), 'r2': scores['test_r2'].mean(),
+                'fit_time': scores['fit_time'].sum(),
+            })
+
+    return rows
+
+
+def main(out_path: str = OUT_PATH):
+
+    results = run_sweep(load_seasons())
+    write_table(results, out_path)
+    print(results.sort_values('rmse').head(10).to_string(index=False))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,155 @@
+import os
+import pickle
+import hashlib
+from typing import Callable, Iterable
+
+# Default bound on total size of cached artifacts, in bytes
+MAX_BYTES = 512 * 2**20
+SUFFIX = '.pkl'
+BLOCK_SIZE = 2**20
+
+
+class ArtifactCache:
+    """On-disk cache of pickled artifacts (e.g. feature matrices, fitted estimators)
+
+    Entries are keyed by a hash of their input files' contents and the parameters used to build them, so a change to
+    either gives a new key. Reads refresh an entry's modification time, and writes evict the least recently used
+    entries once the cache exceeds `max_bytes` or `max_entries`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES, max_entries: int = None):
+        """
+        :param directory: cache directory, created on first write
+        :param max_bytes: maximum total size of cached entries
+        :param max_entries: maximum number of cached entries, default = unbounded
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._digests = {}
+
+    def file_digest(self, path: str) -> str:
+        """Get content hash of a file, rehashing only if it has changed since it was last hashed
+        :param path: file path
+        :return: hex digest
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._digests.get(path)
+        if entry is None or entry[0] != signature:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                    digest.update(block)
+            entry = (signature, digest.hexdigest())
+            self._digests[path] = entry
+
+        return entry[1]
+
+    def key(self, files: Iterable[str] = (), **params) -> str:
+        """Build cache key from input files and parameters
+        :param files: paths of input files, keyed by content rather than path
+        :param params: parameters used to build the artifact, keyed by repr
+        :return: hex digest key
+        """
+        digest = hashlib.sha256()
+        for path in sorted(files):
+            digest.update(self.file_digest(path).encode())
+
+        for name, value in sorted(params.items()):
+            digest.update(f"{name}={value!r};".encode())
+
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{SUFFIX}")
+
+    def get(self, key: str, default=None):
+        """Get cached artifact, marking it as recently used
+        :param key: cache key
+        :param default: returned if key not found (or entry unreadable)
+        :return: cached artifact
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Discarding unreadable cache entry {path}: {e!r}")
+            self.delete(key)
+            return default
+
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value) -> None:
+        """Store artifact, replacing atomically, then evict least recently used entries over the cache bounds
+        :param key: cache key
+        :param value: picklable artifact
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_or_compute(self, key: str, compute: Callable):
+        """Get cached artifact, computing and storing it if not found
+        :param key: cache key
+        :param compute: function taking no arguments and returning artifact
+        :return: artifact
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+
+        return value
+
+    def delete(self, key: str) -> None:
+        """Remove entry, if present"""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self) -> list:
+        """Get cached entries as (last used, size, path), least recently used first"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        return sorted(entries)
+
+    def evict(self) -> None:
+        """Remove least recently used entries until within max_bytes and max_entries"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        max_entries = len(entries) if self.max_entries is None else self.max_entries
+
+        for count, (_, size, path) in enumerate(entries):
+            if total <= self.max_bytes and len(entries) - count <= max_entries:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,139 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Callable
+from urllib.parse import urlsplit
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientResponseError, ClientConnectionError
+from utils.gen import fetch_html
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Asynchronous token bucket, allowing `rate` acquisitions per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        :param rate: tokens added per second
+        :param capacity: maximum tokens held, i.e. burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CrawlScheduler:
+    """Bounded-concurrency HTTP fetcher with per-host rate limiting, retries and a pooled keep-alive session
+
+    Use as an async context manager, then `await scheduler.fetch(url)`. Failed attempts on transient errors (connection
+    errors, timeouts and RETRY_STATUSES) are retried with exponential backoff and full jitter, without holding a
+    concurrency slot while waiting.
+    """
+
+    def __init__(self, max_concurrency: int = 10, per_host: int = 4, rate: float = 2.0, burst: int = 1,
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 30., timeout: float = 30.,
+                 keepalive: float = 30.):
+        """
+        :param max_concurrency: maximum requests in flight across all hosts
+        :param per_host: maximum requests in flight per host
+        :param rate: maximum requests per second per host
+        :param burst: maximum burst of requests per host above rate
+        :param retries: maximum retries per request after the first attempt
+        :param backoff: base delay in seconds, doubled with each retry
+        :param max_backoff: maximum delay in seconds between retries
+        :param timeout: total timeout in seconds for each request
+        :param keepalive: seconds to keep idle pooled connections open
+        """
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.keepalive = keepalive
+
+        self.session = None
+        self.failures = {}
+        self._semaphore = None
+        self._hosts = {}
+
+    async def __aenter__(self):
+        connector = TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host,
+                                 keepalive_timeout=self.keepalive, ttl_dns_cache=300)
+        self.session = ClientSession(connector=connector, timeout=ClientTimeout(total=self.timeout))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    def _host_limits(self, url: str) -> tuple:
+        """Get (semaphore, token bucket) for the host of a url, created on first use"""
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = (asyncio.Semaphore(self.per_host), TokenBucket(self.rate, self.burst))
+
+        return self._hosts[host]
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        """Get delay before next attempt, respecting any Retry-After header sent with the error"""
+        headers = getattr(error, 'headers', None) or {}
+        retry_after = headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """Check whether a failed request is worth retrying"""
+        if isinstance(error, ClientResponseError):
+            return error.status in RETRY_STATUSES
+
+        return isinstance(error, (ClientConnectionError, asyncio.TimeoutError))
+
+    async def fetch(self, url: str, fetch_fn: Callable = fetch_html, **kwargs):
+        """Fetch url within the concurrency, rate and retry limits of the scheduler
+        :param url: url to fetch
+        :param fetch_fn: coroutine function called as fetch_fn(url=url, session=session, **kwargs)
+        :param kwargs: passed to fetch_fn
+        :return: result of fetch_fn
+        """
+        semaphore, bucket = self._host_limits(url)
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore, semaphore:
+                    await bucket.acquire()
+                    return await fetch_fn(url=url, session=self.session, **kwargs)
+
+            except Exception as e:
+                if attempt == self.retries or not self.is_transient(e):
+                    self.failures[url] = e
+                    raise
+
+                delay = self._delay(attempt, e)
+                logger.warning("Attempt %d failed for URL: %s (%r), retrying in %.2fs", attempt + 1, url, e, delay)
+                await asyncio.sleep(delay)
@@ -1,9 +1,18 @@
 import os
 import csv
-import collections
+import logging
+import operator
+import itertools
+import collections.abc
 import pandas as pd
 import Levenshtein as lev
-from aiohttp import ClientSession
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only needed for annotations, aiohttp is slow to import and unused by the analysis code
+    from aiohttp import ClientSession
+
+logger = logging.getLogger(__name__)
 
 
 def get_dirs(path: str) -> list:
@@ -15,34 +24,78 @@ def get_dirs(path: str) -> list:
     return dirs
 
 
-async def fetch_html(url: str, session: ClientSession, **kwargs) -> str:
+async def fetch_html(url: str, session: 'ClientSession', **kwargs) -> str:
     """GET request wrapper to fetch page HTML.
     :param url: Url path to fetch
     :param session:
     :param kwargs: Passed to session.request()
     :return : html text response
     """
-    resp = await session.request(method="GET", url=url, **kwargs)
-    resp.raise_for_status()
-    print("Got response [%s] for URL: %s", resp.status, url)
-    html = await resp.text()
+    async with session.request(method="GET", url=url, **kwargs) as resp:
+        resp.raise_for_status()
+        logger.debug("Got response [%s] for URL: %s", resp.status, url)
+        html = await resp.text()
+
     return html
 
 
-def dict2csv(d: (list, dict), file_path: str) -> None:
-    """Write list of dicts to csv file, where headers are dict keys
-    :param d: Dict to be written
+def dict2csv(d, file_path: str, fieldnames: (list, tuple) = None, append: bool = False, sample: int = 100,
+             chunk_size: int = 1000) -> None:
+    """Stream dicts to csv file, where headers are dict keys
+    Rows are consumed and written in chunks, so memory use does not grow with the number of rows
+    :param d: Dict, or iterable (e.g. generator) of dicts to be written
     :param file_path: Path to csv file
+    :param fieldnames: Declared column names, default = existing header if appending, otherwise keys of first rows
+    :param append: Option to append to existing file, keeping its header
+    :param sample: Number of rows read ahead to find column names when not declared
+    :param chunk_size: Number of rows written at a time
     """
     if isinstance(d, dict):
         d = [d]
 
-    keys = d[0].keys()
+    rows = iter(d)
+    write_header = not (append and os.path.exists(file_path) and os.path.getsize(file_path))
+
+    if not write_header:
+        with open(file_path, newline='') as csv_file:
+            fieldnames = next(csv.reader(csv_file))
+
+    elif fieldnames is None:
+        head = list(itertools.islice(rows, sample))
+        fieldnames = list(dict.fromkeys(k for row in head for k in row))
+        rows = itertools.chain(head, rows)
+
+    if not fieldnames:
+        return None
+
+    fields = set(fieldnames)
+    dropped = set()
+    with open(file_path, "w" if write_header else "a", newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+
+        for chunk in chunked(rows, chunk_size):
+            dropped.update(k for row in chunk for k in row if k not in fields)
+            writer.writerows(chunk)
+
+    if dropped:
+        print(f"Columns not in header of {file_path} were dropped: {sorted(dropped)}")
+
+
+def chunked(iterable, size: int):
+    """Split iterable into lists of at most `size` items, without reading further ahead
+    :param iterable: Iterable to split
+    :param size: Maximum chunk length
+    :return: Generator of lists
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
 
-    with open(file_path, "w", newline='') as csv_file:
-        writer = csv.DictWriter(csv_file, keys)
-        writer.writeheader()
-        writer.writerows(d)
+        yield chunk
 
 
 def csv2pd(file_path: str) -> pd.DataFrame:
@@ -111,37 +164,139 @@ def sum_dict_list(data, only_keys: (list, tuple) = None, omit_keys: (list, tuple
 
 
 def flatten_dict(d, parent_key: str = '', delimiter: str = '_') -> dict:
-    """Recursively flatten multi-level dict
+    """Flatten multi-level dict, iteratively with a stack of item iterators to preserve key order
     :param d: Multi-level dict
-    :param parent_key: Key from upper level in recursive chain
+    :param parent_key: Prefix for all keys
     :param delimiter: Delimiter to join keys
     :return: Single level (flattened) dict
     """
-    items = []
-    for k, v in d.items():
-        new_key = parent_key + delimiter + k if parent_key else k
-        if isinstance(v, collections.MutableMapping):
-            items.extend(flatten_dict(v, new_key, delimiter=delimiter).items())
+    flat = {}
+    stack = [(parent_key, iter(d.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            key = prefix + delimiter + k if prefix else k
+            if isinstance(v, collections.abc.MutableMapping):
+                stack.append((key, iter(v.items())))
+                break
+            flat[key] = v
         else:
-            items.append((new_key, v))
-    return dict(items)
+            stack.pop()
+
+    return flat
 
 
 def flatten_list(lst: list) -> list:
-    """Recursively flatten multi-level list
+    """Flatten multi-level list, iteratively with a stack of iterators to preserve order
     :param lst: Multi-level list
     :return flat: Single level (flattened) list
     """
     flat = []
-    for item in lst:
-        if isinstance(item, list):
-            flat.extend(flatten_list(item))
-        else:
+    stack = [iter(lst)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, list):
+                stack.append(iter(item))
+                break
             flat.append(item)
+        else:
+            stack.pop()
 
     return flat
 
 
+class Flattener:
+    """Flatten many dicts sharing the same nested structure, e.g. understat history rows with 'ppda' sub-dicts
+
+    The structure (the keys of each nested dict) is learnt from the first row, after which each row is flattened by
+    fixed getters over its leaf values, with no per-row recursion or key string building. Rows that do not match the
+    learnt structure, e.g. with renamed keys or a leaf that has become a dict, fall back to flatten_dict.
+    """
+
+    def __init__(self, delimiter: str = '_'):
+        """
+        :param delimiter: Delimiter to join keys
+        """
+        self.delimiter = delimiter
+        self.keys = None
+        self._nodes = None
+        self._order = None
+
+    @staticmethod
+    def _getter(path: tuple) -> Callable:
+        """Get function returning the value at a path of keys within a dict"""
+        if not path:
+            return lambda r: r
+
+        getters = [operator.itemgetter(k) for k in path]
+        if len(getters) == 1:
+            return getters[0]
+
+        def get(r):
+            for getter in getters:
+                r = getter(r)
+            return r
+
+        return get
+
+    def learn(self, d) -> None:
+        """Learn nested structure from example dict
+        :param d: Multi-level dict
+        """
+        paths = []
+        nodes = {(): (tuple(d), [])}
+        stack = [((), iter(d.items()))]
+        while stack:
+            path, items = stack[-1]
+            for k, v in items:
+                if isinstance(v, collections.abc.MutableMapping):
+                    stack.append(((*path, k), iter(v.items())))
+                    nodes[(*path, k)] = (tuple(v), [])
+                    break
+                nodes[path][1].append(len(paths))
+                paths.append((*path, k))
+            else:
+                stack.pop()
+
+        self.keys = tuple(self.delimiter.join(path) for path in paths)
+        # Per dict in the structure: getter, its keys and its leaf keys
+        self._nodes = []
+        order = []
+        for path, (keys, leaves) in nodes.items():
+            self._nodes.append((self._getter(path), keys, tuple(paths[i][-1] for i in leaves)))
+            order.extend(leaves)
+
+        # Leaf values are gathered dict by dict, then put back in key order
+        position = {leaf: i for i, leaf in enumerate(order)}
+        self._order = operator.itemgetter(*[position[i] for i in range(len(paths))]) if len(paths) > 1 else tuple
+
+    def _values(self, d):
+        """Get leaf values of a row in key order, None if its keys differ from the learnt structure at any level"""
+        values = []
+        for get, keys, leaves in self._nodes:
+            node = get(d)
+            if type(node) is not dict or tuple(node) != keys:
+                return None
+            values.extend(map(node.__getitem__, leaves))
+
+        return self._order(values)
+
+    def __call__(self, d) -> dict:
+        """Flatten dict using learnt structure, learning it first if required
+        :param d: Multi-level dict
+        :return: Single level (flattened) dict
+        """
+        if self.keys is None:
+            self.learn(d)
+
+        values = self._values(d)
+        # A leaf that has become a dict is flattened further
+        if values is not None and dict not in map(type, values):
+            return dict(zip(self.keys, values))
+
+        return flatten_dict(d, delimiter=self.delimiter)
+
+
 def fuzzy_string_match(str1: str, comp: list, tol: float = 0.95) -> (str, float):
     """Finding closest match of string within list of strings
     :param str1: string to search for
@@ -151,13 +306,14 @@ def fuzzy_string_match(str1: str, comp: list, tol: float = 0.95) -> (str, float)
             ratio: comparison ratio between str1 and matched string
     """
 
-    if str1 == comp:
+    if str1 in comp:
         # Start off with direct comparison
         match = str1
         match_ratio = 1.0
     else:
-        # Compare with all using Levenshtein comparison
-        ratio = [lev.ratio(str1.lower(), s.lower()) for s in comp]
+        # Compare with all using Levenshtein comparison (see utils.matching.NameMatcher for repeated matching)
+        lower = str1.lower()
+        ratio = [lev.ratio(lower, s.lower()) for s in comp]
         match_ratio = max(ratio)
         match = comp[ratio.index(match_ratio)]
 
@@ -186,8 +342,8 @@ def str2num(data):
         for k, v in data.items():
             data[k] = str2num(v)
 
-    # Manual type conversion test
-    else:
+    # Manual type conversion test, only strings need converting
+    elif isinstance(data, str):
         try:
             data = float(data) if '.' in data else int(data)
         except ValueError:
@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Iterable, List, Tuple
+import Levenshtein as lev
+
+# Length of character n-grams used to shortlist candidates
+NGRAM = 3
+# Most candidates compared in full per query, by number of shared n-grams
+SHORTLIST = 10
+# Match ratio below which a warning is printed, and the match is not remembered as an alias
+TOL = 0.95
+RE_PUNCTUATION = re.compile(r"[^\w\s]")
+RE_SPACE = re.compile(r"\s+")
+
+
+def normalise(name: str) -> str:
+    """Normalise name for comparison: accents and punctuation removed, lower case, single spaces
+    :param name: team or player name
+    :return: normalised name
+    """
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = RE_PUNCTUATION.sub(' ', name.lower())
+    return RE_SPACE.sub(' ', name).strip()
+
+
+def ngrams(name: str, n: int = NGRAM) -> set:
+    """Get character n-grams of a (normalised) name, padded so that short names and word ends are included"""
+    padded = f" {name} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class NameMatcher:
+    """Fuzzy matcher of names (e.g. scraped lineups) against a fixed set of candidates (e.g. understat players)
+
+    Candidates are normalised and indexed once. Each query is resolved, in order, from remembered aliases, by exact
+    match of normalised names, by exact match of a trailing part of a name that only one candidate has (e.g. a surname,
+    with any initials in the query agreeing with the candidate's first names), optionally by a candidate matching the
+    leading words of the query (e.g. "Brighton" for "Brighton & Hove Albion"), or by Levenshtein ratio against the
+    candidates sharing most n-grams with it. Confident matches are remembered as aliases, which can be saved and
+    reloaded so they are resolved immediately next time.
+    """
+
+    def __init__(self, candidates: Iterable[str], aliases_path: str = None, tol: float = TOL, n: int = NGRAM,
+                 shortlist: int = SHORTLIST, prefixes: bool = False):
+        """
+        :param candidates: names to match against
+        :param aliases_path: json file of remembered aliases, loaded if it exists, written by save
+        :param tol: match ratio below which a warning is printed and the match is not remembered
+        :param n: length of character n-grams used to shortlist candidates
+        :param shortlist: most candidates compared in full per query
+        :param prefixes: option to match a candidate named by the leading words of a query, e.g. for team names where
+            candidates are short forms of the queries
+        """
+        self.candidates = list(dict.fromkeys(candidates))
+        self.aliases_path = aliases_path
+        self.tol = tol
+        self.n = n
+        self.shortlist = shortlist
+        self.prefixes = prefixes
+
+        self._candidate_set = set(self.candidates)
+        self.normalised = [normalise(c) for c in self.candidates]
+        self.exact = {}
+        self.index = defaultdict(list)
+        for i, name in enumerate(self.normalised):
+            self.exact.setdefault(name, i)
+            for gram in ngrams(name, n):
+                self.index[gram].append(i)
+
+        # Trailing words of names, e.g. "salah" and "van dijk", dropping any shared by more than one candidate
+        self.suffixes = {}
+        shared = set()
+        for i, name in enumerate(self.normalised):
+            words = name.split()
+            for k in range(1, len(words)):
+                suffix = ' '.join(words[k:])
+                if self.suffixes.setdefault(suffix, i) != i:
+                    shared.add(suffix)
+        for suffix in shared:
+            del self.suffixes[suffix]
+
+        self.aliases = {}
+        if aliases_path is not None and os.path.exists(aliases_path):
+            with open(aliases_path, 'r', encoding='utf-8') as f:
+                self.aliases = json.load(f)
+
+    def match(self, query: str) -> Tuple[str, float]:
+        """Find closest candidate to a name
+        :param query: name to search for
+        :return match: closest candidate, None if no candidates
+                ratio: comparison ratio between normalised query and match, 1.0 for exact and remembered matches
+        """
+        alias = self.aliases.get(query)
+        if alias is not None and alias in self._candidate_set:
+            return alias, 1.0
+
+        name = normalise(query)
+        if name in self.exact:
+            i = self.exact[name]
+        else:
+            i = self._suffix(name)
+            if i is None and self.prefixes:
+                i = self._prefix(name)
+
+        if i is not None:
+            match, ratio = self.candidates[i], 1.0
+        else:
+            match, ratio = self._closest(name)
+
+        if match is None:
+            return None, 0.0
+
+        if ratio < self.tol:
+            message = "Ratio: {:.2f} less than tolerance: {:.2f}, matched '{}' with '{}'"
+            print(message.format(ratio, self.tol, query, match))
+        elif query != match:
+            self.aliases[query] = match
+
+        return match, ratio
+
+    def match_all(self, queries: Iterable[str]) -> List[Tuple[str, float]]:
+        """Find closest candidate to each of many names, matching each distinct name once
+        :param queries: names to search for
+        :return: list of (match, ratio) in order of queries, see match
+        """
+        queries = list(queries)
+        matches = {q: self.match(q) for q in dict.fromkeys(queries)}
+        return [matches[q] for q in queries]
+
+    def _suffix(self, name: str):
+        """Find the only candidate whose name ends with the normalised name, where any initials (e.g. "m salah") must
+        be initials of the candidate's other names"""
+        if name in self.suffixes:
+            return self.suffixes[name]
+
+        words = name.split()
+        initials = [w for w in words if len(w) == 1]
+        suffix = ' '.join(w for w in words if len(w) > 1)
+        i = self.suffixes.get(suffix)
+        if i is None:
+            return None
+
+        first_names = self.normalised[i].split()[:-len(suffix.split())]
+        if all(any(w.startswith(initial) for w in first_names) for initial in initials):
+            return i
+
+        return None
+
+    def _prefix(self, name: str):
+        """Find the candidate whose name is the most leading words of the normalised name"""
+        words = name.split()
+        for k in range(len(words) - 1, 0, -1):
+            i = self.exact.get(' '.join(words[:k]))
+            if i is not None:
+                return i
+
+        return None
+
+    def _closest(self, name: str) -> Tuple[str, float]:
+        """Compare normalised name in full against candidates sharing most n-grams, or all if none are shared"""
+        shared = Counter(i for gram in ngrams(name, self.n) for i in self.index.get(gram, ()))
+        if shared:
+            shortlist = [i for i, _ in shared.most_common(self.shortlist)]
+        else:
+            shortlist = range(len(self.candidates))
+
+        best, best_ratio = None, -1.
+        for i in shortlist:
+            ratio = lev.ratio(name, self.normalised[i])
+            if ratio > best_ratio:
+                best, best_ratio = i, ratio
+
+        return (self.candidates[best], best_ratio) if best is not None else (None, 0.0)
+
+    def add_alias(self, query: str, match: str) -> None:
+        """Remember a match, e.g. one corrected by hand
+        :param query: name as found in source
+        :param match: candidate it refers to
+        """
+        self.aliases[query] = match
+
+    def save(self) -> None:
+        """Write remembered aliases to aliases_path, replacing atomically"""
+        if self.aliases_path is None:
+            raise ValueError("No aliases_path to save to")
+
+        tmp_path = f"{self.aliases_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.aliases, f, indent=2, sort_keys=True, ensure_ascii=False)
+
+        os.replace(tmp_path, self.aliases_path)
@@ -1,5 +1,12 @@
 import numpy as np
 
+# Odds formats, e.g. the same price as 3/2, 2.5, +150 and 0.4
+FRACTIONAL, DECIMAL, AMERICAN, PROBABILITY = 'fractional', 'decimal', 'american', 'probability'
+FORMATS = (FRACTIONAL, DECIMAL, AMERICAN, PROBABILITY)
+# Convergence of batched Newton iteration in margin removal
+TOL = 1e-12
+MAX_ITER = 50
+
 
 def combined_odds(odds: np.array) -> float:
 
@@ -7,14 +14,226 @@ def combined_odds(odds: np.array) -> float:
     return probs2odds(prob)
 
 
-def odds2probs(odds: np.array) -> np.array:
-
-    return 1./(odds + 1)
-
+def odds2probs(odds: np.array, fmt: str = FRACTIONAL) -> np.array:
+    """Convert odds to implied probabilities
+    :param odds: odds in given format
+    :param fmt: odds format, one of FORMATS
+    :return: implied probabilities (including bookmaker margin)
+    """
+    if fmt == FRACTIONAL:
+        return 1./(odds + 1)
+    elif fmt == DECIMAL:
+        return 1./odds
+    elif fmt == AMERICAN:
+        odds = np.asarray(odds, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(odds > 0, 100. / (odds + 100), -odds / (100 - odds))
+    elif fmt == PROBABILITY:
+        return odds
+
+    raise ValueError(f"Invalid odds format '{fmt}'. Expected one of: {FORMATS}")
+
+
+def probs2odds(probs: np.array, fmt: str = FRACTIONAL) -> np.array:
+    """Convert implied probabilities to odds
+    :param probs: implied probabilities
+    :param fmt: odds format, one of FORMATS
+    :return: odds in given format, American odds are positive for probabilities of 0.5 and below
+    """
+    if fmt == FRACTIONAL:
+        return 1./probs - 1
+    elif fmt == DECIMAL:
+        return 1./probs
+    elif fmt == AMERICAN:
+        probs = np.asarray(probs, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(probs <= 0.5, 100 * (1 - probs) / probs, -100 * probs / (1 - probs))
+    elif fmt == PROBABILITY:
+        return probs
+
+    raise ValueError(f"Invalid odds format '{fmt}'. Expected one of: {FORMATS}")
+
+
+def convert_odds(odds: np.array, from_fmt: str, to_fmt: str) -> np.array:
+    """Convert odds between formats
+    :param odds: odds in from_fmt
+    :param from_fmt: current odds format, one of FORMATS
+    :param to_fmt: required odds format, one of FORMATS
+    :return: odds in to_fmt
+    """
+    if from_fmt == to_fmt:
+        return odds
+
+    return probs2odds(odds2probs(odds, from_fmt), to_fmt)
+
+
+def _newton(fn, x0: np.array, tol: float = TOL, max_iter: int = MAX_ITER) -> np.array:
+    """Solve fn(x) = 0 for many independent problems at once, iterating only those not yet converged
+    :param fn: function taking x and an index array of problems, returning values and derivatives at x
+    :param x0: initial guesses, one per problem
+    :return: solutions, NaN where fn is NaN
+    """
+    x = np.array(x0, dtype=float)
+    active = np.arange(len(x))
+    for _ in range(max_iter):
+        value, slope = fn(x[active], active)
+        done = ~(np.abs(value) > tol)
+        x[active[np.isnan(value)]] = np.nan
+
+        step = value / slope
+        x[active[~done]] -= step[~done]
+        active = active[~done]
+        if not len(active):
+            break
+
+    return x
+
+
+def _proportional(probs: np.array) -> np.array:
+    """Scale probabilities to sum to one"""
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def _power(probs: np.array) -> np.array:
+    """Raise probabilities to the power k that makes them sum to one"""
+    logs = np.log(probs)
+
+    def fn(k, idx):
+        powered = probs[idx] ** k[:, np.newaxis]
+        return powered.sum(axis=1) - 1, (powered * logs[idx]).sum(axis=1)
+
+    k = _newton(fn, np.ones(len(probs)))
+    return probs ** k[:, np.newaxis]
+
+
+def _shin_probs(z: np.array, squared: np.array) -> tuple:
+    """Shin's true probabilities for insider proportion z, with their derivative with respect to z"""
+    z = z[:, np.newaxis]
+    root = np.sqrt(z ** 2 + 4 * (1 - z) * squared)
+    probs = (root - z) / (2 * (1 - z))
+    slope = ((z - 2 * squared) / root - 1) / (2 * (1 - z)) + (root - z) / (2 * (1 - z) ** 2)
+    return probs, slope
+
+
+def _shin(probs: np.array) -> np.array:
+    """Shin's method, solving for the proportion of insider trading z that makes true probabilities sum to one"""
+    squared = probs ** 2 / probs.sum(axis=1, keepdims=True)
+
+    def fn(z, idx):
+        shin, slope = _shin_probs(z, squared[idx])
+        return shin.sum(axis=1) - 1, slope.sum(axis=1)
+
+    z = _newton(fn, np.zeros(len(probs)))
+    return _shin_probs(z, squared)[0]
+
+
+def _odds_ratio(probs: np.array) -> np.array:
+    """Odds ratio method, solving for the ratio c between implied and true odds that makes probabilities sum to one"""
+
+    def fn(c, idx):
+        p = probs[idx]
+        denominator = c[:, np.newaxis] + p * (1 - c[:, np.newaxis])
+        return (p / denominator).sum(axis=1) - 1, -(p * (1 - p) / denominator ** 2).sum(axis=1)
+
+    c = _newton(fn, np.ones(len(probs)))[:, np.newaxis]
+    return probs / (c + probs * (1 - c))
+
+
+MARGIN_METHODS = {'proportional': _proportional, 'power': _power, 'shin': _shin, 'odds_ratio': _odds_ratio}
+
+
+def remove_margin(odds: np.array, fmt: str = FRACTIONAL, method: str = 'proportional') -> np.array:
+    """Estimate true outcome probabilities from bookmaker odds, removing the margin across outcomes of each market
+    :param odds: odds with outcomes along the last axis, any leading shape (e.g. markets, bookmakers)
+    :param fmt: odds format, one of FORMATS
+    :param method: one of MARGIN_METHODS, iterative methods are solved for all markets at once
+    :return: probabilities summing to one per market, same shape as odds, NaN for markets with a missing price
+    """
+    if method not in MARGIN_METHODS:
+        raise ValueError(f"Invalid method '{method}'. Expected one of: {tuple(MARGIN_METHODS)}")
+
+    probs = np.asarray(odds2probs(np.asarray(odds, dtype=float), fmt), dtype=float)
+    flat = probs.reshape(-1, probs.shape[-1])
+    return MARGIN_METHODS[method](flat).reshape(probs.shape)
+
+
+def best_prices(odds: np.array) -> tuple:
+    """Find best price for each outcome of each market across bookmakers
+    :param odds: fractional odds, shape (markets, bookmakers, outcomes), NaN where a bookmaker has no price
+    :return: best odds and index of bookmaker offering them, both shape (markets, outcomes), books are -1 where no
+        bookmaker has a price
+    """
+    odds = np.asarray(odds, dtype=float)
+    if odds.ndim != 3:
+        raise ValueError(f"Expected odds of shape (markets, bookmakers, outcomes), got {odds.shape}")
+
+    filled = np.where(np.isnan(odds), -np.inf, odds)
+    books = filled.argmax(axis=1)
+    prices = np.take_along_axis(odds, books[:, np.newaxis, :], axis=1)[:, 0, :]
+
+    books[np.isnan(prices)] = -1
+    return prices, books
+
+
+def overround(odds: np.array, axis: int = -1) -> np.array:
+    """Sum of implied probabilities across outcomes, below 1 where backing every outcome guarantees a profit
+    :param odds: fractional odds, outcomes along axis
+    :param axis: axis of outcomes
+    :return: summed probabilities, with axis removed
+    """
+    return odds2probs(np.asarray(odds, dtype=float)).sum(axis=axis)
 
-def probs2odds(probs: np.array) -> np.array:
 
-    return 1./probs - 1
+def dutch(odds: np.array, stake=100., mask: np.array = None, decimals: int = None) -> tuple:
+    """Split stake across outcomes so that each selected outcome returns the same amount
+    :param odds: fractional odds, shape (markets, outcomes)
+    :param stake: total stake per market, scalar or shape (markets,)
+    :param mask: boolean array of outcomes to back, same shape as odds, default = all
+    :param decimals: option to round stakes, e.g. 1 for 10p units
+    :return: stakes, shape (markets, outcomes), and guaranteed return (stake included) of each market if any selected
+        outcome wins, shape (markets,)
+    """
+    odds = np.asarray(odds, dtype=float)
+    probs = odds2probs(odds)
+    if mask is not None:
+        probs = np.where(mask, probs, 0.)
+
+    stake = np.asarray(stake, dtype=float).reshape(-1, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stakes = stake * probs / probs.sum(axis=1, keepdims=True)
+
+    if decimals is not None:
+        stakes = stakes.round(decimals)
+
+    selected = stakes > 0
+    returns = np.where(selected, stakes * (odds + 1), np.inf).min(axis=1)
+    returns[~selected.any(axis=1)] = np.nan
+    return stakes, returns
+
+
+def arbitrage(odds: np.array, stake=100., decimals: int = None, fmt: str = FRACTIONAL) -> dict:
+    """Find arbitrage across bookmakers for many markets at once, backing every outcome at its best price
+    :param odds: odds, shape (markets, bookmakers, outcomes), NaN where a bookmaker has no price
+    :param stake: total stake per market, scalar or shape (markets,)
+    :param decimals: option to round stakes, e.g. 1 for 10p units
+    :param fmt: odds format, one of FORMATS, best 'prices' are returned as fractional odds
+    :return: dict of best 'prices' and their 'books' (markets, outcomes), 'overround' of best prices (markets,),
+        'arbitrage' flags (markets,), 'stakes' (markets, outcomes), guaranteed 'returns' and 'profit' (markets,)
+    """
+    prices, books = best_prices(convert_odds(np.asarray(odds, dtype=float), fmt, FRACTIONAL))
+    total = overround(prices)
+    stakes, returns = dutch(prices, stake, decimals=decimals)
+
+    return {
+        'prices': prices,
+        'books': books,
+        'overround': total,
+        # Markets missing a price for any outcome cannot be covered
+        'arbitrage': total < 1,
+        'stakes': stakes,
+        'returns': returns,
+        'profit': returns - stakes.sum(axis=1),
+    }
 
 
 if __name__ == "__main__":
@@ -23,19 +242,12 @@ if __name__ == "__main__":
     book1_odds = np.array([1/3, 4, 13/2, 66, 500])
     book2_odds = np.array([1/2, 5, 6, 100, 200])
 
-    all_odds = np.vstack([book1_odds, book2_odds])
-
-    ids = all_odds.argmax(axis=0)
-    odds_arr = np.max(all_odds, axis=0)
-
-    prob_arr = odds2probs(odds_arr)
-    # stake_arr = np.ceil(stake * prob_arr / prob_arr.sum())
-    stake_arr = (stake * prob_arr/prob_arr.sum()).round(1)
-    return_arr = (stake_arr * odds_arr) + stake_arr
-    stake_dict = [{"book": book_id, "stake": s, "return": r}
-                  for book_id, s, r in zip(ids, stake_arr, return_arr)]
+    # One market, two books
+    result = arbitrage(np.vstack([book1_odds, book2_odds])[np.newaxis], stake, decimals=1)
+    stake_dict = [{"book": book_id, "stake": s, "return": s * (o + 1)}
+                  for book_id, s, o in zip(result['books'][0], result['stakes'][0], result['prices'][0])]
 
-    print("Summed probabilities", prob_arr.sum())
-    print("Probabilities: ", prob_arr)
+    print("Summed probabilities", result['overround'][0])
+    print("Probabilities: ", odds2probs(result['prices'][0]))
     print("Stakes: ", stake_dict)
-    print("Stake/Returns: ", f"{sum(stake_arr)}/{min(return_arr)}")
+    print("Stake/Returns: ", f"{result['stakes'][0].sum()}/{result['returns'][0]}")
@@ -0,0 +1,251 @@
+import os
+import asyncio
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.gen import dict2csv, chunked
+
+FORMATS = ('csv', 'parquet', 'feather')
+# Feather (Arrow IPC) is left uncompressed so that it can be memory-mapped without a decode step
+COMPRESSION = {'parquet': 'zstd', 'feather': 'uncompressed'}
+# Rows converted and written at a time when streaming to columnar formats
+CHUNK_SIZE = 10000
+# Column types understood by apply_schema
+STR, INT, FLOAT, BOOL, DATETIME = 'str', 'int', 'float', 'bool', 'datetime'
+BOOLS = {'True': True, 'true': True, '1': True, 'False': False, 'false': False, '0': False}
+
+
+def get_format(file_path: str, fmt: str = None) -> str:
+    """Get storage format of file, either as specified or from file extension
+    :param file_path: Path to file
+    :param fmt: Storage format, one of FORMATS, default = file extension
+    :return: Storage format string
+    """
+    if fmt is None:
+        fmt = os.path.splitext(file_path)[1].lstrip('.')
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Expected one of: {FORMATS}")
+
+    return fmt
+
+
+def infer_dtypes(df: pd.DataFrame, exclude: (list, tuple, dict) = ()) -> pd.DataFrame:
+    """Convert text columns to numeric where every value in the column can be converted
+    :param df: Data frame to be converted (modified in place)
+    :param exclude: Columns to leave as they are
+    :return: Converted data frame
+    """
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if col in exclude:
+            continue
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
+
+    return df
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Convert columns to declared types, one vectorised conversion per column
+    Missing values are allowed (integer columns containing them become float), values that cannot be converted raise
+    :param df: Data frame to be converted (modified in place)
+    :param schema: Dict of type (STR, INT, FLOAT, BOOL or DATETIME) by column name, other columns are left as they are
+    :return: Converted data frame
+    """
+    for col in df.columns.intersection(list(schema)):
+        values = df[col]
+        kind = schema[col]
+
+        if kind == STR:
+            converted = values.astype(str).where(values.notna())
+        elif kind in (INT, FLOAT):
+            converted = pd.to_numeric(values, errors='coerce')
+            if kind == INT and not converted.isna().any():
+                converted = converted.astype('int64')
+            else:
+                converted = converted.astype('float64')
+        elif kind == BOOL:
+            converted = values if pd.api.types.is_bool_dtype(values) else values.astype(str).map(BOOLS)
+        elif kind == DATETIME:
+            converted = pd.to_datetime(values, errors='coerce')
+        else:
+            raise ValueError(f"Invalid type '{kind}' for column '{col}'. Expected one of: {(STR, INT, FLOAT, BOOL, DATETIME)}")
+
+        invalid = converted.isna() & values.notna()
+        if invalid.any():
+            raise ValueError(f"Column '{col}' has values that are not {kind}: {values[invalid].unique()[:5].tolist()}")
+
+        df[col] = converted
+
+    return df
+
+
+def write_table(data, file_path: str, fmt: str = None, fieldnames: (list, tuple) = None, append: bool = False,
+                schema: dict = None) -> None:
+    """Write tabular data to file
+    Iterables of dicts (e.g. generators) are streamed in chunks, so memory use does not grow with the number of rows
+    :param data: Iterable of dicts, dict or data frame to be written
+    :param file_path: Path to output file
+    :param fmt: Storage format, one of FORMATS, default = file extension
+    :param fieldnames: Declared column names, default = found from first rows
+    :param append: Option to append to existing file, csv only
+    :param schema: Declared column types for typed formats (see apply_schema), other columns are inferred
+    """
+    fmt = get_format(file_path, fmt)
+
+    if fmt == 'csv':
+        if isinstance(data, pd.DataFrame) and not append:
+            data.to_csv(file_path, index=False, columns=fieldnames)
+        else:
+            rows = data.to_dict('records') if isinstance(data, pd.DataFrame) else data
+            dict2csv(rows, file_path, fieldnames=fieldnames, append=append)
+        return
+
+    if append:
+        raise ValueError(f"Appending is not supported for format '{fmt}'")
+
+    if isinstance(data, pd.DataFrame):
+        df = data if fieldnames is None else data[list(fieldnames)]
+        df = infer_dtypes(apply_schema(df.copy(), schema or {}), exclude=schema or {})
+        if fmt == 'parquet':
+            df.to_parquet(file_path, index=False, compression=COMPRESSION[fmt])
+        else:
+            df.to_feather(file_path, compression=COMPRESSION[fmt])
+        return
+
+    write_columnar_chunks([data] if isinstance(data, dict) else data, file_path, fmt, fieldnames, schema)
+
+
+def write_columnar_chunks(rows, file_path: str, fmt: str, fieldnames: (list, tuple) = None,
+                          schema: dict = None) -> None:
+    """Stream rows to a parquet or feather file, one chunk of CHUNK_SIZE rows at a time
+    The Arrow schema is fixed by the first chunk, with declared columns given their declared types (so an INT column
+    holds nulls whichever chunk its missing values are in), and later chunks are aligned and cast to it
+    :param rows: Iterable of dicts
+    :param file_path: Path to output file
+    :param fmt: Storage format, 'parquet' or 'feather'
+    :param fieldnames: Declared column names, default = keys of first chunk
+    :param schema: Declared column types (see apply_schema), other columns are inferred from the first chunk
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_schema = None
+    writer = None
+    try:
+        for chunk in chunked(rows, CHUNK_SIZE):
+            df = pd.DataFrame.from_records(chunk, columns=fieldnames)
+            if arrow_schema is not None:
+                df = df.reindex(columns=arrow_schema.names)
+
+            df = infer_dtypes(apply_schema(df, schema or {}), exclude=schema or {})
+            table = pa.Table.from_pandas(df, schema=arrow_schema, preserve_index=False)
+
+            if writer is None:
+                arrow_schema = _arrow_schema(table.schema, schema or {})
+                table = table.cast(arrow_schema)
+                if fmt == 'parquet':
+                    writer = pq.ParquetWriter(file_path, arrow_schema, compression=COMPRESSION[fmt])
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=None)
+                    writer = pa.ipc.new_file(file_path, arrow_schema, options=options)
+
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _arrow_schema(inferred, schema: dict):
+    """Replace the types of declared columns in an Arrow schema inferred from a chunk by their declared types"""
+    import pyarrow as pa
+
+    types = {STR: pa.string(), INT: pa.int64(), FLOAT: pa.float64(), BOOL: pa.bool_(), DATETIME: pa.timestamp('us')}
+    fields = [field.with_type(types[schema[field.name]]) if field.name in schema else field for field in inferred]
+    return pa.schema(fields, metadata=inferred.metadata)
+
+
+def read_table(file_path: str, columns: (list, tuple) = None, fmt: str = None, schema: dict = None) -> pd.DataFrame:
+    """Read tabular data file to pandas data frame
+    :param file_path: Path to file
+    :param columns: Option to only read certain columns
+    :param fmt: Storage format, one of FORMATS, default = file extension
+    :param schema: Option to convert columns to declared types (see apply_schema)
+    :return: Data frame of returned data
+    """
+    df = _read_table(file_path, columns, get_format(file_path, fmt))
+    return apply_schema(df, schema) if schema else df
+
+
+def _read_table(file_path: str, columns: list, fmt: str) -> pd.DataFrame:
+    """Read tabular data file in given format to pandas data frame"""
+    columns = list(columns) if columns is not None else None
+
+    if fmt == 'csv':
+        return pd.read_csv(file_path, usecols=columns)
+    elif fmt == 'parquet':
+        return pd.read_parquet(file_path, columns=columns)
+
+    return read_arrow(file_path, columns).to_pandas()
+
+
+def read_arrow(file_path: str, columns: (list, tuple) = None):
+    """Read feather file to an Arrow table memory-mapped from disk, without copying its data into memory
+    Pages are read on access and shared between processes mapping the same file. Converting to pandas copies the
+    converted columns, so select only those needed first
+    :param file_path: Path to feather file
+    :param columns: Option to only read certain columns
+    :return: pyarrow Table
+    """
+    # Imported on first use so that csv/parquet-only users do not pay for it at import time
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        raise ImportError("pyarrow is required to read feather files")
+
+    return feather.read_table(file_path, columns=list(columns) if columns is not None else None, memory_map=True)
+
+
+class WriterPool:
+    """Runs blocking write functions on a thread pool so disk I/O does not stall the event loop
+
+    At most `max_pending` writes are queued or running at once, beyond which `submit` waits, applying backpressure to
+    producers rather than buffering unbounded output in memory. Use as an async context manager, exiting waits for all
+    submitted writes to finish.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 8):
+        """
+        :param workers: number of writer threads
+        :param max_pending: maximum writes queued or running before submit waits
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._semaphore = None
+        self._pending = set()
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='writer')
+        self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """Submit write function to pool, waiting for a free slot if too many writes are pending
+        :param fn: blocking function to run
+        :param args: passed to fn
+        :return: future resolving to result of fn
+        """
+        await self._semaphore.acquire()
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        future.add_done_callback(lambda _: self._semaphore.release())
+        return future